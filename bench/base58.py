@@ -0,0 +1,38 @@
+import common
+import pxsol
+import random
+import test_base58
+
+# Benchmark of the base58 codec.
+#
+# Usage: python bench/base58.py
+
+for size in [32, 64]:
+    data = [bytearray(random.randbytes(size)) for _ in range(10000)]
+    text = [pxsol.base58.encode(e) for e in data]
+    a = common.bench(f'encode {size} (reference)', lambda: [
+        test_base58.encode_reference(e) for e in data], 1, len(data))
+    b = common.bench(f'encode {size}', lambda: [pxsol.base58.encode(e) for e in data], 1, len(data))
+    print(f'speedup encode={a / b:.2f}x')
+    a = common.bench(f'decode {size} (reference)', lambda: [
+        test_base58.decode_reference(e) for e in text], 1, len(text))
+    b = common.bench(f'decode {size}', lambda: [pxsol.base58.decode(e) for e in text], 1, len(text))
+    print(f'speedup decode={a / b:.2f}x')
+for size, distinct in [(10000, 2500), (10000, 10000), (1000000, 250000), (1000000, 1000000)]:
+    # Rpc responses repeat hot keys, about one key in four is distinct in the first case of each size. In the second,
+    # every key is distinct, so that the many variants have nothing to deduplicate.
+    name = f'{size}/{distinct}'
+    if distinct == size:
+        data = [bytearray(random.randbytes(32)) for _ in range(size)]
+        text = [pxsol.base58.encode(e) for e in data]
+    else:
+        keys = [bytearray(random.randbytes(32)) for _ in range(distinct)]
+        data = [random.choice(keys) for _ in range(size)]
+        text = [pxsol.base58.encode(e) for e in keys]
+        text = [random.choice(text) for _ in range(size)]
+    common.bench(f'encode x {name} (loop)', lambda: [pxsol.base58.encode(e) for e in data], 1, size)
+    common.bench(f'encode x {name} (many)', lambda: pxsol.base58.encode_many(data), 1, size)
+    common.bench(f'encode x {name} (many, pool)', lambda: pxsol.base58.encode_many(data, None), 1, size)
+    common.bench(f'decode x {name} (loop)', lambda: [pxsol.base58.decode(e) for e in text], 1, size)
+    common.bench(f'decode x {name} (many)', lambda: pxsol.base58.decode_many(text), 1, size)
+    common.bench(f'decode x {name} (many, pool)', lambda: pxsol.base58.decode_many(text, None), 1, size)
@@ -0,0 +1,16 @@
+import os
+import sys
+import timeit
+
+# Helpers shared by the benchmarks.
+
+# The reference implementations the benchmarks compare against are the ones the tests validate against, they are
+# imported from the test modules.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'test'))
+
+
+def bench(name: str, func: callable, number: int, size: int = 1) -> float:
+    # Run func number times, each run handles size items. Reports the time per item.
+    t = timeit.timeit(func, number=number) / number / size
+    print(f'{name:<32} {t * 1000000:12.3f} us/op {1 / t:12.0f} op/s')
+    return t
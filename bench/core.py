@@ -0,0 +1,253 @@
+import common
+import io
+import pxsol
+import random
+import test_eddsa
+import tracemalloc
+import typing
+
+# Benchmark of keys and transactions.
+#
+# Usage: python bench/core.py
+
+
+def serialize_reference(tx: pxsol.core.Transaction) -> bytearray:
+    # Serialize the transaction from many small bytearrays. It is the baseline of the benchmark.
+    m = tx.message
+    r = bytearray()
+    r.extend(pxsol.core.compact_u16_encode(len(tx.signatures)))
+    for e in tx.signatures:
+        r.extend(e)
+    r.extend(m.header.serialize())
+    r.extend(pxsol.core.compact_u16_encode(len(m.account_keys)))
+    for e in m.account_keys:
+        r.extend(e.p)
+    r.extend(m.recent_blockhash)
+    r.extend(pxsol.core.compact_u16_encode(len(m.instructions)))
+    for e in m.instructions:
+        r.append(e.program)
+        r.extend(pxsol.core.compact_u16_encode(len(e.account)))
+        for a in e.account:
+            r.append(a)
+        r.extend(pxsol.core.compact_u16_encode(len(e.data)))
+        r.extend(e.data)
+    return r
+
+
+def requisition_decode_reference(pubkey: pxsol.core.PubKey, data: typing.List[pxsol.core.Requisition]):
+    # The message compiler resolving indexes with list.index. It is the baseline of the benchmark.
+    account_flat = [pxsol.core.AccountMeta(pubkey, 3)]
+    for r in data:
+        account_flat.append(pxsol.core.AccountMeta(r.program, 0))
+        account_flat.extend([pxsol.core.AccountMeta(a.pubkey, a.mode) for a in r.account])
+    account_list = []
+    account_dict = {}
+    for a in account_flat:
+        if a.pubkey not in account_dict:
+            account_list.append(a)
+            account_dict[a.pubkey] = len(account_list) - 1
+            continue
+        account_list[account_dict[a.pubkey]].mode |= a.mode
+    account_list.sort(key=lambda x: x.mode, reverse=True)
+    tx = pxsol.core.Transaction([], pxsol.core.Message(pxsol.core.MessageHeader(0, 0, 0), [], bytearray(), []))
+    tx.message.account_keys.extend([e.pubkey for e in account_list])
+    tx.message.header.required_signatures = len([k for k in account_list if k.mode >= 2])
+    tx.message.header.readonly_signatures = len([k for k in account_list if k.mode == 2])
+    tx.message.header.readonly = len([k for k in account_list if k.mode == 0])
+    for r in data:
+        program = tx.message.account_keys.index(r.program)
+        account = [tx.message.account_keys.index(a.pubkey) for a in r.account]
+        tx.message.instructions.append(pxsol.core.Instruction(program, account, r.data))
+    return tx
+
+
+class PubKeyReference:
+    # The mutable public key backed by a bytearray, without any cache. It is the baseline of the benchmark.
+
+    def __init__(self, p: bytearray) -> None:
+        assert len(p) == 32
+        self.p = p
+
+    def __hash__(self) -> int:
+        return int.from_bytes(self.p)
+
+    def __eq__(self, other) -> bool:
+        return self.p == other.p
+
+    def base58(self) -> str:
+        return pxsol.base58.encode(self.p)
+
+
+def memory(name: str, func: callable, size: int) -> None:
+    # Reports the memory allocated per item by func, which builds size items.
+    tracemalloc.start()
+    data = func()
+    m = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f'{name:<32} {m / size:12.1f} bytes/op')
+    return data
+
+
+pts = [bytearray(random.randbytes(32)) for _ in range(1000)]
+a = common.bench('pt_exists (reference)', lambda: [test_eddsa.pt_exists_reference(e) for e in pts], 1, len(pts))
+b = common.bench('pt_exists', lambda: [pxsol.eddsa.pt_exists(e) for e in pts], 1, len(pts))
+print(f'speedup pt_exists={a / b:.2f}x')
+program = pxsol.core.ProgramLoaderUpgradeable.pubkey
+seeds = [bytearray(random.randbytes(32)) for _ in range(1000)]
+pxsol.core.program_address_cache = pxsol.core.ProgramAddressCache(0, None)
+pt_exists = pxsol.eddsa.pt_exists
+pxsol.eddsa.pt_exists = test_eddsa.pt_exists_reference
+a = common.bench('derive (reference)', lambda: [program.derive(e) for e in seeds], 1, len(seeds))
+pxsol.eddsa.pt_exists = pt_exists
+b = common.bench('derive', lambda: [program.derive(e) for e in seeds], 1, len(seeds))
+print(f'speedup derive={a / b:.2f}x')
+pxsol.core.program_address_cache = pxsol.core.ProgramAddressCache(len(seeds), None)
+a = common.bench('find_program_address (cold)', lambda: [
+    program.find_program_address([e]) for e in seeds], 1, len(seeds))
+b = common.bench('find_program_address (warm)', lambda: [
+    program.find_program_address([e]) for e in seeds], 1, len(seeds))
+print(f'speedup cache={a / b:.2f}x')
+pxsol.core.program_address_cache = pxsol.core.ProgramAddressCache(0, None)
+seeds = [bytearray(random.randbytes(32)) for _ in range(4000)]
+prikeys = [bytearray(random.randbytes(32)) for _ in range(4000)]
+for n in [1, 2, 4, 8]:
+    common.bench(f'derive_many (workers={n})', lambda: list(pxsol.core.derive_many(program, seeds, n)), 1, len(seeds))
+for n in [1, 2, 4, 8]:
+    common.bench(f'pubkey_many (workers={n})', lambda: list(
+        pxsol.core.pubkey_many(map(pxsol.core.PriKey, prikeys), n)), 1, len(prikeys))
+raw = [bytearray(random.randbytes(32)) for _ in range(100000)]
+a = memory('pubkey memory (reference)', lambda: [PubKeyReference(bytearray(e)) for e in raw], len(raw))
+b = memory('pubkey memory', lambda: [pxsol.core.PubKey(bytearray(e)) for e in raw], len(raw))
+for name, data in [('reference', a), ('slots', b)]:
+    d = {e: i for i, e in enumerate(data)}
+    common.bench(f'pubkey dict lookup ({name})', lambda: [d[e] for e in data], 1, len(data))
+for name, data in [('reference', a), ('cached', b)]:
+    common.bench(f'pubkey base58 x 4 ({name})', lambda: [
+        [e.base58() for _ in range(4)] for e in data[:10000]], 1, 10000)
+block = []
+for i in range(1000):
+    # A block of transactions signed by random senders. Most are transfers, one in four is a larger call with many
+    # accounts, similar to a swap through several programs.
+    sender = pxsol.core.PubKey(bytearray(random.randbytes(32)))
+    rqs = []
+    for _ in range(1 if i % 4 else 3):
+        rq = pxsol.core.Requisition(pxsol.core.PubKey(bytearray(random.randbytes(32))), [], bytearray())
+        rq.account.append(pxsol.core.AccountMeta(sender, 3))
+        for _ in range(1 if i % 4 else 12):
+            rq.account.append(pxsol.core.AccountMeta(pxsol.core.PubKey(bytearray(random.randbytes(32))), 1))
+        rq.data = bytearray(random.randbytes(12 if i % 4 else 96))
+        rqs.append(rq)
+    tx = pxsol.core.Transaction.requisition_decode(sender, rqs)
+    tx.message.recent_blockhash = bytearray(random.randbytes(32))
+    tx.signatures.append(bytearray(random.randbytes(64)))
+    block.append(bytes(tx.serialize()))
+a = common.bench('decode block (reader)', lambda: [
+    pxsol.core.Transaction.serialize_decode_reader(io.BytesIO(e)) for e in block], 8, len(block))
+b = common.bench('decode block (view)', lambda: [
+    pxsol.core.Transaction.serialize_decode_view(memoryview(e), 0)[0] for e in block], 8, len(block))
+print(f'speedup view={a / b:.2f}x')
+# Filter the block for transactions touching one account, then materialize the matches.
+target = pxsol.core.TransactionView(block[500]).account_key(1)
+a = common.bench('filter block (decode)', lambda: [
+    t for t in map(pxsol.core.Transaction.serialize_decode, block) if target in t.message.account_keys], 8, len(block))
+b = common.bench('filter block (lazy view)', lambda: [
+    t.transaction() for t in map(pxsol.core.TransactionView, block) if t.account_index(target) >= 0], 8, len(block))
+print(f'speedup lazy view={a / b:.2f}x')
+tx = pxsol.core.Transaction.serialize_decode(block[4])
+assert serialize_reference(tx) == tx.serialize()
+
+
+def serialize_uncached():
+    tx.signed = None
+    return tx.serialize()
+
+
+a = common.bench('serialize (reference)', lambda: serialize_reference(tx), 10000, 1)
+b = common.bench('serialize (one buffer)', serialize_uncached, 10000, 1)
+# The message bytes are kept by sign.
+tx.signatures = []
+tx.sign([pxsol.core.PriKey.int_decode(1) for _ in range(tx.message.header.required_signatures)])
+c = common.bench('serialize (cached message)', tx.serialize, 10000, 1)
+print(f'speedup one buffer={a / b:.2f}x cached={a / c:.2f}x')
+for n in [2, 16, 64]:
+    # A transaction with n accounts, every instruction references eight of them.
+    payer = pxsol.core.PubKey(bytearray(random.randbytes(32)))
+    pool = [pxsol.core.PubKey(bytearray(random.randbytes(32))) for _ in range(n - 1)]
+    rqs = []
+    for _ in range(max(1, n // 4)):
+        rq = pxsol.core.Requisition(pool[0], [], bytearray(8))
+        for _ in range(8):
+            rq.account.append(pxsol.core.AccountMeta(random.choice(pool), random.randint(0, 3)))
+        rqs.append(rq)
+    assert requisition_decode_reference(payer, rqs).serialize() == pxsol.core.Transaction.requisition_decode(
+        payer, rqs).serialize()
+    a = common.bench(f'requisition decode {n} accounts (reference)', lambda: requisition_decode_reference(
+        payer, rqs), 1000, 1)
+    b = common.bench(f'requisition decode {n} accounts', lambda: pxsol.core.Transaction.requisition_decode(
+        payer, rqs), 1000, 1)
+    print(f'speedup {n} accounts={a / b:.2f}x')
+# Build and sign transfers to many recipients, the way Wallet.transfer does, against a patched template.
+user = pxsol.core.PriKey.int_decode(1)
+dest = [pxsol.core.PubKey(bytearray(random.randbytes(32))) for _ in range(256)]
+hash = bytearray(random.randbytes(32))
+
+
+def transfer_requisition(pubkey: pxsol.core.PubKey, value: int) -> bytearray:
+    rq = pxsol.core.Requisition(pxsol.core.ProgramSystem.pubkey, [], bytearray())
+    rq.account.append(pxsol.core.AccountMeta(user.pubkey(), 3))
+    rq.account.append(pxsol.core.AccountMeta(pubkey, 1))
+    rq.data = pxsol.core.ProgramSystem.transfer(value)
+    tx = pxsol.core.Transaction.requisition_decode(user.pubkey(), [rq])
+    tx.message.recent_blockhash = hash
+    tx.sign([user])
+    return tx.serialize()
+
+
+rq = pxsol.core.Requisition(pxsol.core.ProgramSystem.pubkey, [], bytearray())
+rq.account.append(pxsol.core.AccountMeta(user.pubkey(), 3))
+rq.account.append(pxsol.core.AccountMeta(dest[0], 1))
+rq.data = pxsol.core.ProgramSystem.transfer(0)
+tt = pxsol.core.TransactionTemplate.requisition_decode(user.pubkey(), [rq])
+tt_dest = tt.account_index(dest[0])
+tt.patch_recent_blockhash(hash)
+
+
+def transfer_template(pubkey: pxsol.core.PubKey, value: int) -> bytearray:
+    tt.patch_account_key(tt_dest, pubkey)
+    tt.patch_instruction_data(0, pxsol.core.ProgramSystem.transfer(value))
+    return tt.sign([user])
+
+
+assert transfer_template(dest[1], 1) == transfer_requisition(dest[1], 1)
+a = common.bench('transfer (requisition)', lambda: [
+    transfer_requisition(e, i) for i, e in enumerate(dest)], 4, len(dest))
+b = common.bench('transfer (template)', lambda: [transfer_template(e, i) for i, e in enumerate(dest)], 4, len(dest))
+print(f'speedup template={a / b:.2f}x')
+# Pack transfers to many recipients, against a greedy packer that compiles the transaction after each addition.
+transfer = []
+for e in [pxsol.core.PubKey(bytearray(random.randbytes(32))) for _ in range(2000)]:
+    rq = pxsol.core.Requisition(pxsol.core.ProgramSystem.pubkey, [], pxsol.core.ProgramSystem.transfer(1))
+    rq.account.append(pxsol.core.AccountMeta(user.pubkey(), 3))
+    rq.account.append(pxsol.core.AccountMeta(e, 1))
+    transfer.append(rq)
+
+
+def requisition_pack_reference(pubkey: pxsol.core.PubKey, data: typing.List[pxsol.core.Requisition]):
+    batch = []
+    for r in data:
+        tx = pxsol.core.Transaction.requisition_decode(pubkey, batch + [r])
+        if batch and tx.serialized_size() + tx.message.header.required_signatures * 64 > 1232:
+            yield pxsol.core.Transaction.requisition_decode(pubkey, batch)
+            batch = []
+        batch.append(r)
+    yield pxsol.core.Transaction.requisition_decode(pubkey, batch)
+
+
+a = list(requisition_pack_reference(user.pubkey(), transfer))
+b = list(pxsol.core.requisition_pack(user.pubkey(), transfer))
+assert [e.serialize() for e in a] == [e.serialize() for e in b]
+print(f'pack {len(transfer)} transfers into {len(b)} transactions, one per transfer would pay {len(transfer)} fees')
+a = common.bench('pack (reference)', lambda: list(
+    requisition_pack_reference(user.pubkey(), transfer)), 1, len(transfer))
+b = common.bench('pack', lambda: list(pxsol.core.requisition_pack(user.pubkey(), transfer)), 1, len(transfer))
+print(f'speedup pack={a / b:.2f}x')
@@ -0,0 +1,29 @@
+import common
+import pxsol
+import random
+
+# Micro benchmark of the field and point arithmetic.
+#
+# Usage: python bench/ed25519.py
+
+
+P = pxsol.ed25519.P
+a = pxsol.ed25519.Fq(random.randint(0, P - 1))
+b = pxsol.ed25519.Fq(random.randint(0, P - 1))
+x = a.x
+y = b.x
+p = pxsol.ed25519.G * pxsol.ed25519.Fr(random.randint(1, pxsol.ed25519.N - 1))
+q = pxsol.ed25519.G * pxsol.ed25519.Fr(random.randint(1, pxsol.ed25519.N - 1))
+m = pxsol.ed25519.PtExt.affine_decode(p)
+n = pxsol.ed25519.PtExt.affine_decode(q)
+
+u = common.bench('add (Fq)', lambda: a + b, 100000)
+v = common.bench('add (int)', lambda: (x + y) % P, 100000)
+print(f'speedup int={u / v:.2f}x')
+u = common.bench('mul (Fq)', lambda: a * b, 100000)
+v = common.bench('mul (int)', lambda: x * y % P, 100000)
+print(f'speedup int={u / v:.2f}x')
+u = common.bench('point add (Pt)', lambda: p + q, 1000)
+v = common.bench('point add (PtExt)', lambda: m + n, 100000)
+print(f'speedup ext={u / v:.2f}x')
+common.bench('point double (PtExt)', lambda: m.double(), 100000)
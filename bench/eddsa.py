@@ -0,0 +1,51 @@
+import common
+import pxsol
+import random
+
+# Benchmark eddsa signing and verification.
+#
+# Usage: python bench/eddsa.py
+
+
+def affine_mul(self: pxsol.ed25519.Pt, k: pxsol.ed25519.Fr) -> pxsol.ed25519.Pt:
+    # Double-and-add in affine coordinates, each addition costs two inversions. It is the baseline of the benchmark.
+    n = k.x
+    result = pxsol.ed25519.I
+    addend = self
+    while n:
+        if n & 1:
+            result += addend
+        addend = addend + addend
+        n = n >> 1
+    return result
+
+
+prikey = bytearray(random.randbytes(32))
+pubkey = pxsol.eddsa.pubkey(prikey)
+msg = bytearray(random.randbytes(256))
+sig = pxsol.eddsa.sign(prikey, msg)
+k = pxsol.ed25519.Fr(random.randint(1, pxsol.ed25519.N - 1))
+pxsol.ed25519.gmul(k)
+
+a = common.bench('G * k (affine)', lambda: affine_mul(pxsol.ed25519.G, k), 8)
+b = common.bench('G * k (extended)', lambda: pxsol.ed25519.G * k, 32)
+c = common.bench('G * k (fixed-base)', lambda: pxsol.ed25519.gmul(k), 128)
+print(f'speedup extended={a / b:.2f}x fixed-base={a / c:.2f}x')
+p = pxsol.eddsa.pt_decode(pubkey)
+a = common.bench('sG + hA (separate)', lambda: pxsol.ed25519.G * k + p * k, 16)
+b = common.bench('sG + hA (straus)', lambda: pxsol.ed25519.dmul(k, k, p), 32)
+print(f'speedup straus={a / b:.2f}x')
+common.bench('pubkey', lambda: pxsol.eddsa.pubkey(prikey), 128)
+a = common.bench('sign', lambda: pxsol.eddsa.sign(prikey, msg), 128)
+k = pxsol.core.PriKey(prikey)
+b = common.bench('sign (cached key)', lambda: k.sign(msg), 128)
+print(f'speedup cached={a / b:.2f}x')
+common.bench('verify', lambda: pxsol.eddsa.verify(pubkey, msg, sig), 32)
+for n in [64, 256, 1024]:
+    data = []
+    for _ in range(n):
+        prikey = bytearray(random.randbytes(32))
+        data.append((pxsol.eddsa.pubkey(prikey), msg, pxsol.eddsa.sign(prikey, msg)))
+    a = common.bench(f'verify x {n} (loop)', lambda: [pxsol.eddsa.verify(*e) for e in data], 1)
+    b = common.bench(f'verify x {n} (batch)', lambda: pxsol.eddsa.verify_batch(data), 1)
+    print(f'speedup batch={a / b:.2f}x')
@@ -0,0 +1,132 @@
+import asyncio
+import common
+import concurrent.futures
+import http.server
+import json
+import pxsol
+import random
+import requests
+import threading
+import time
+
+# Benchmark of the rpc client against a local stand-in server, which answers every call with the current slot, or no
+# accounts for getMultipleAccounts, or a zero blockhash. It measures the client overhead only: connection setup, http
+# and json.
+#
+# Usage: python bench/rpc.py
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    # The latency in seconds added to each response, it stands for the network round trip to a remote node.
+    latency = 0
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self) -> None:
+        data = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        time.sleep(self.latency)
+        if isinstance(data, list):
+            body = json.dumps([{'jsonrpc': '2.0', 'id': e['id'], 'result': 42} for e in data]).encode()
+        elif data['method'] == 'getLatestBlockhash':
+            body = json.dumps({'jsonrpc': '2.0', 'id': data['id'], 'result': {
+                'context': {'slot': 42},
+                'value': {'blockhash': pxsol.base58.encode(bytearray(32)), 'lastValidBlockHeight': 192},
+            }}).encode()
+        elif data['method'] == 'getMultipleAccounts':
+            assert len(data['params'][0]) <= 100
+            body = json.dumps({'jsonrpc': '2.0', 'id': data['id'], 'result': {
+                'context': {'slot': 42},
+                'value': [None for _ in data['params'][0]],
+            }}).encode()
+        else:
+            body = json.dumps({'jsonrpc': '2.0', 'id': data['id'], 'result': 42}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+def call_reference(method: str, params: list) -> object:
+    # A new connection for every call. It is the baseline of the benchmark.
+    r = requests.post(pxsol.config.current.url, json={
+        'id': random.randint(0x00000000, 0xffffffff),
+        'jsonrpc': '2.0',
+        'method': method,
+        'params': params,
+    }).json()
+    if 'error' in r:
+        raise Exception(r['error'])
+    return r['result']
+
+
+server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+server.daemon_threads = True
+threading.Thread(target=server.serve_forever, daemon=True).start()
+pxsol.config.current.url = f'http://127.0.0.1:{server.server_address[1]}'
+assert call_reference('getSlot', []) == pxsol.rpc.call('getSlot', []) == 42
+a = common.bench('call (reference)', lambda: [call_reference('getSlot', []) for _ in range(500)], 1, 500)
+b = common.bench('call (pooled)', lambda: [pxsol.rpc.call('getSlot', []) for _ in range(500)], 1, 500)
+print(f'speedup pooled={a / b:.2f}x')
+with concurrent.futures.ThreadPoolExecutor(8) as pool:
+    a = common.bench('call x 8 threads (reference)', lambda: list(
+        pool.map(lambda _: call_reference('getSlot', []), range(1000))), 1, 1000)
+    b = common.bench('call x 8 threads (pooled)', lambda: list(
+        pool.map(lambda _: pxsol.rpc.call('getSlot', []), range(1000))), 1, 1000)
+    print(f'speedup pooled={a / b:.2f}x')
+
+
+async def call_async_many(n: int) -> list:
+    return await asyncio.gather(*[pxsol.rpc_async.call('getSlot', []) for _ in range(n)])
+
+
+c = common.bench('call x 1000 in flight (async)', lambda: asyncio.run(call_async_many(1000)), 1, 1000)
+print(f'speedup async={b / c:.2f}x against 8 pooled threads')
+calls = [('getBalance', [pxsol.core.PriKey.int_decode(i + 1).pubkey().base58()]) for i in range(1000)]
+a = common.bench('balance sweep (call)', lambda: [pxsol.rpc.call(*e) for e in calls], 1, len(calls))
+b = common.bench('balance sweep (batch)', lambda: pxsol.rpc.batch(calls), 1, len(calls))
+print(f'speedup batch={a / b:.2f}x')
+
+
+def get_multiple_accounts_reference(pubkey_list: list) -> list:
+    # Split by hand and send the chunks one after another.
+    r = []
+    for i in range(0, len(pubkey_list), 100):
+        r.extend(pxsol.rpc.call('getMultipleAccounts', [pubkey_list[i:i + 100], {}])['value'])
+    return r
+
+
+# A snapshot of 50k accounts from a node 20 ms away.
+Handler.latency = 0.02
+addr = [pxsol.base58.encode(random.randbytes(32)) for _ in range(50000)]
+assert get_multiple_accounts_reference(addr) == pxsol.rpc.get_multiple_accounts(addr, {})['value']
+a = common.bench('snapshot 50k (sequential)', lambda: get_multiple_accounts_reference(addr), 1, len(addr))
+b = common.bench('snapshot 50k (chunked)', lambda: pxsol.rpc.get_multiple_accounts(addr, {}), 1, len(addr))
+c = common.bench('snapshot 50k (chunked async)', lambda: asyncio.run(
+    pxsol.rpc_async.get_multiple_accounts(addr, {})), 1, len(addr))
+print(f'speedup chunked={a / b:.2f}x async={a / c:.2f}x')
+
+
+def sign_transfer(blockhash: pxsol.rpc.Blockhash) -> bytearray:
+    # Sign a transfer the way pxsol.wallet.Wallet does, without sending it.
+    tx.message.recent_blockhash = blockhash.get()
+    tx.sign([user])
+    return tx.serialize()
+
+
+# Transfers signed one after another, against the same node 20 ms away.
+user = pxsol.core.PriKey.int_decode(1)
+rq = pxsol.core.Requisition(pxsol.core.ProgramSystem.pubkey, [], pxsol.core.ProgramSystem.transfer(1))
+rq.account.append(pxsol.core.AccountMeta(user.pubkey(), 3))
+rq.account.append(pxsol.core.AccountMeta(pxsol.core.PriKey.int_decode(2).pubkey(), 1))
+tx = pxsol.core.Transaction.requisition_decode(user.pubkey(), [rq])
+blockhash = pxsol.rpc.BlockhashCache()
+a = common.bench('sign transfer (blockhash)', lambda: [
+    sign_transfer(pxsol.rpc.Blockhash()) for _ in range(100)], 1, 100)
+b = common.bench('sign transfer (blockhash cache)', lambda: [sign_transfer(blockhash) for _ in range(100)], 1, 100)
+print(f'speedup blockhash cache={a / b:.2f}x')
+blockhash.close()
+server.shutdown()
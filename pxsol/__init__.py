@@ -5,5 +5,7 @@ from . import denomination
 from . import ed25519
 from . import eddsa
 from . import log
+from . import parallel
 from . import rpc
+from . import rpc_async
 from . import wallet
@@ -12,49 +12,93 @@
 
 # Base58 encoding and decoding
 
+import pxsol.parallel
+import typing
+
 B58_DIGITS = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+# All pairs of digits, B58_PAIRS[n] is the two digit encoding of n < 58^2.
+B58_PAIRS = [a + b for a in B58_DIGITS for b in B58_DIGITS]
+# Reverse lookup table of B58_PAIRS.
+B58_PAIRS_INDEX = {e: i for i, e in enumerate(B58_PAIRS)}
+# Conversions between the integer and base58 are done ten digits at a time, so there is one big integer division or
+# multiplication per ten digits. Each chunk of ten digits is handled with small integers and the pair tables.
+B58_CHUNK = 58 ** 10
 
 
 def encode(b: bytearray) -> str:
     # Encode bytes to a base58-encoded string
-    assert isinstance(b, bytearray)
+    assert isinstance(b, (bytes, bytearray, memoryview))
     # Convert big-endian bytes to integer
     n = int.from_bytes(b)
+    # Encode leading zeros as base58 zeros
+    pad = len(b) - (n.bit_length() + 7) // 8
     # Divide that integer into bas58
     res = []
-    while n > 0:
-        n, r = divmod(n, 58)
-        res.append(B58_DIGITS[r])
-    res = ''.join(res[::-1])
-    # Encode leading zeros as base58 zeros
-    czero = 0
-    pad = 0
-    for c in b:
-        if c == czero:
-            pad += 1
-        else:
-            break
-    return B58_DIGITS[0] * pad + res
+    while n:
+        n, c = divmod(n, B58_CHUNK)
+        c, d0 = divmod(c, 3364)
+        c, d1 = divmod(c, 3364)
+        c, d2 = divmod(c, 3364)
+        c, d3 = divmod(c, 3364)
+        res.append(B58_PAIRS[c] + B58_PAIRS[d3] + B58_PAIRS[d2] + B58_PAIRS[d1] + B58_PAIRS[d0])
+    res.reverse()
+    return B58_DIGITS[0] * pad + ''.join(res).lstrip(B58_DIGITS[0])
 
 
 def decode(s: str) -> bytearray:
     # Decode a base58-encoding string, returning bytes.
     if not s:
         return bytearray()
-    # Convert the string to an integer
+    # Convert the string to an integer. The string is left padded with base58 zeros to a multiple of ten digits, which
+    # doesn't change its value.
+    t = B58_DIGITS[0] * (-len(s) % 10) + s
     n = 0
-    for c in s:
-        n *= 58
-        assert c in B58_DIGITS
-        digit = B58_DIGITS.index(c)
-        n += digit
-    # Convert the integer to bytes
-    res = bytearray(n.to_bytes(max((n.bit_length() + 7) // 8, 1)))
-    # Add padding back.
-    pad = 0
-    for c in s[:-1]:
-        if c == B58_DIGITS[0]:
-            pad += 1
-        else:
-            break
-    return bytearray(pad) + res
+    try:
+        for i in range(0, len(t), 10):
+            c = B58_PAIRS_INDEX[t[i:i+2]]
+            c = c * 3364 + B58_PAIRS_INDEX[t[i+2:i+4]]
+            c = c * 3364 + B58_PAIRS_INDEX[t[i+4:i+6]]
+            c = c * 3364 + B58_PAIRS_INDEX[t[i+6:i+8]]
+            c = c * 3364 + B58_PAIRS_INDEX[t[i+8:i+10]]
+            n = n * B58_CHUNK + c
+    except KeyError:
+        raise AssertionError('invalid base58 digit')
+    # A string of only base58 zeros decodes to the same number of zero bytes.
+    if n == 0:
+        return bytearray(len(s))
+    # Convert the integer to bytes and add padding back.
+    pad = len(s) - len(s.lstrip(B58_DIGITS[0]))
+    return bytearray(pad) + bytearray(n.to_bytes((n.bit_length() + 7) // 8))
+
+
+def encode_many(data: typing.List[bytearray], workers: int = 1) -> typing.List[str]:
+    # Encode a batch of byte strings. Batches taken from rpc responses repeat the same keys a lot (programs, sysvars,
+    # hot accounts), so each distinct value is encoded only once. This deduplication is the only saving over a loop of
+    # encode, a batch of distinct values is slower by the cost of the lookups. With more than one worker, the batch is
+    # spread across a process pool instead.
+    if workers != 1:
+        return list(pxsol.parallel.imap(encode, data, workers, 4096))
+    memo = {}
+    r = []
+    for e in data:
+        k = bytes(e)
+        s = memo.get(k)
+        if s is None:
+            s = memo[k] = encode(e)
+        r.append(s)
+    return r
+
+
+def decode_many(data: typing.List[str], workers: int = 1) -> typing.List[bytearray]:
+    # Decode a batch of base58 strings, each distinct string is decoded only once. As with encode_many, this is the
+    # only saving over a loop of decode. With more than one worker, the batch is spread across a process pool instead.
+    if workers != 1:
+        return list(pxsol.parallel.imap(decode, data, workers, 4096))
+    memo = {}
+    r = []
+    for e in data:
+        b = memo.get(e)
+        if b is None:
+            b = memo[e] = decode(e)
+        r.append(bytearray(b))
+    return r
@@ -13,23 +13,43 @@ class ObjectDict(dict):
 
 
 develop = ObjectDict({
+    # Maximum number of calls sent in one json rpc batch request, larger batches are split.
+    'batch': 100,
     # The default state of a commitment, one of the confirmed or finalized.
     'commitment': 'confirmed',
     # Display log output.
     'log': 0,
+    # Maximum number of pooled keep-alive connections to the rpc server.
+    'pool': 8,
+    # Seconds to wait for the rpc server to accept a connection and to send a response.
+    'timeout': 60,
+    # The http transports, see pxsol.rpc.Transport and pxsol.rpc_async.Transport. They are created on first use when
+    # left empty.
+    'transport': None,
+    'transport_async': None,
     # Http rpc.
     'url': 'http://127.0.0.1:8899',
 })
 
 mainnet = ObjectDict({
+    'batch': 100,
     'commitment': 'confirmed',
     'log': 0,
+    'pool': 8,
+    'timeout': 60,
+    'transport': None,
+    'transport_async': None,
     'url': 'https://api.mainnet-beta.solana.com',
 })
 
 testnet = ObjectDict({
+    'batch': 100,
     'commitment': 'confirmed',
     'log': 0,
+    'pool': 8,
+    'timeout': 60,
+    'transport': None,
+    'transport_async': None,
     'url': 'https://api.devnet.solana.com',
 })
 
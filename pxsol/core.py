@@ -1,8 +1,14 @@
+import collections
 import hashlib
 import io
+import itertools
 import json
+import os
 import pxsol.base58
+import pxsol.ed25519
 import pxsol.eddsa
+import pxsol.parallel
+import threading
 import typing
 
 
@@ -14,6 +20,10 @@ class PriKey:
     def __init__(self, p: bytearray) -> None:
         assert len(p) == 32
         self.p = p
+        # The expanded private key, derived on first use. See pxsol.eddsa.expand.
+        self.e = None
+        # The public key, derived on first use.
+        self.u = None
 
     def __hash__(self) -> int:
         return self.int()
@@ -51,13 +61,22 @@ class PriKey:
         # Convert the u256 number to private key, in big endian.
         return PriKey(bytearray(data.to_bytes(32)))
 
+    def expand(self) -> typing.Tuple[pxsol.ed25519.Fr, bytearray, bytearray]:
+        # Get the expanded private key. It is computed once and then cached, the private key must not be modified.
+        if self.e is None:
+            self.e = pxsol.eddsa.expand(self.p)
+        return self.e
+
     def pubkey(self):
-        # Get the eddsa public key corresponding to the private key.
-        return PubKey(pxsol.eddsa.pubkey(self.p))
+        # Get the eddsa public key corresponding to the private key. Public keys are immutable, so a single instance is
+        # created and then shared by all callers.
+        if self.u is None:
+            self.u = PubKey(self.expand()[2])
+        return self.u
 
     def sign(self, data: bytearray) -> bytearray:
         # Sign a message of arbitrary length. Unlike secp256k1, the resulting signature is deterministic.
-        return pxsol.eddsa.sign(self.p, data)
+        return pxsol.eddsa.sign_expand(self.expand(), data)
 
     def wif(self) -> str:
         # Convert the private key to wallet import format. This is the format supported by most third-party wallets.
@@ -77,44 +96,96 @@ class PriKey:
 class PubKey:
     # Solana's public key is a 32-byte array. The base58 representation of the public key is also referred to as the
     # address.
+    #
+    # Public keys are immutable and used as dictionary keys a lot, so the hash is computed once and the base58
+    # representation is cached on first use. Well-known keys and hot accounts can be interned so that a single
+    # instance is shared, see PubKey.intern.
+
+    __slots__ = ['p', 'h', 'b']
+
+    # The intern table, maps the raw bytes to the shared instance.
+    interned: typing.Dict[bytes, 'PubKey'] = {}
 
     def __init__(self, p: bytearray) -> None:
         assert len(p) == 32
-        self.p = p
+        p = bytes(p)
+        object.__setattr__(self, 'p', p)
+        object.__setattr__(self, 'h', hash(p))
+        object.__setattr__(self, 'b', None)
+
+    def __setattr__(self, name: str, value: typing.Any) -> None:
+        raise AttributeError(f'{self.__class__.__name__} is immutable')
+
+    def __reduce__(self) -> typing.Tuple:
+        return (PubKey, (self.p,))
 
     def __hash__(self) -> int:
-        return self.int()
+        return self.h
 
     def __repr__(self) -> str:
         return self.base58()
 
     def __eq__(self, other) -> bool:
-        return self.p == other.p
+        return self is other or self.p == other.p
 
     def base58(self) -> str:
         # Convert the public key to base58 representation.
-        return pxsol.base58.encode(self.p)
+        if self.b is None:
+            object.__setattr__(self, 'b', pxsol.base58.encode(self.p))
+        return self.b
 
     @classmethod
     def base58_decode(cls, data: str) -> typing.Self:
         # Convert the base58 representation to public key.
-        return PubKey(pxsol.base58.decode(data))
+        return PubKey.shared(bytes(pxsol.base58.decode(data)))
+
+    @classmethod
+    def base58_decode_many(cls, data: typing.List[str], workers: int = 1) -> typing.List[typing.Self]:
+        # Convert a batch of base58 representations to public keys. See pxsol.base58.decode_many.
+        return [PubKey.shared(bytes(e)) for e in pxsol.base58.decode_many(data, workers)]
+
+    def create_program_address(self, seeds: typing.List[bytearray]) -> typing.Self:
+        # Create a program derived address from seeds, the last seed is usually the bump. Fails if the address falls on
+        # the ed25519 curve.
+        assert len(seeds) <= 16
+        hash = hashlib.sha256()
+        for e in seeds:
+            assert len(e) <= 32
+            hash.update(e)
+        hash.update(self.p)
+        hash.update(b'ProgramDerivedAddress')
+        data = hash.digest()
+        assert not pxsol.eddsa.pt_exists(data)
+        return PubKey(bytearray(data))
 
     def derive(self, seed: bytearray) -> typing.Self:
         # Program Derived Address (PDA). PDAs are addresses derived deterministically using a combination of
         # user-defined seeds, a bump seed, and a program's ID.
         # See: https://solana.com/docs/core/pda
-        data = bytearray()
-        data.extend(seed)
-        data.append(0xff)
-        data.extend(self.p)
-        data.extend(bytearray('ProgramDerivedAddress'.encode()))
+        return self.find_program_address([seed])[0]
+
+    def find_program_address(self, seeds: typing.List[bytearray]) -> typing.Tuple[typing.Self, int]:
+        # Find a valid program derived address and its bump seed. The bump is searched from 255 down to 0, the first
+        # address that falls off the ed25519 curve is returned. Results are cached in program_address_cache.
+        assert len(seeds) <= 15
+        key = (bytes(self.p), tuple(bytes(e) for e in seeds))
+        find = program_address_cache.get(key)
+        if find:
+            return PubKey(bytearray(find[0])), find[1]
+        hash = hashlib.sha256()
+        for e in seeds:
+            assert len(e) <= 32
+            hash.update(e)
         for i in range(255, -1, -1):
-            data[len(seed)] = i
-            hash = bytearray(hashlib.sha256(data).digest())
+            h = hash.copy()
+            h.update(bytearray([i]))
+            h.update(self.p)
+            h.update(b'ProgramDerivedAddress')
+            data = h.digest()
             # The pda should fall off the ed25519 curve.
-            if not pxsol.eddsa.pt_exists(hash):
-                return PubKey(hash)
+            if not pxsol.eddsa.pt_exists(data):
+                program_address_cache.put(key, (data, i))
+                return PubKey(bytearray(data)), i
         raise Exception
 
     def hex(self) -> str:
@@ -135,6 +206,205 @@ class PubKey:
         # Convert the u256 number to public key, in big endian.
         return PubKey(bytearray(data.to_bytes(32)))
 
+    @classmethod
+    def intern(cls, pubkey: typing.Self) -> typing.Self:
+        # Get the shared instance equal to the public key, the public key itself becomes the shared instance if there
+        # is none yet.
+        return PubKey.interned.setdefault(pubkey.p, pubkey)
+
+    @classmethod
+    def shared(cls, data: bytes) -> typing.Self:
+        # Get the interned public key with the given bytes, or create a new one if it is not interned.
+        pubkey = PubKey.interned.get(data)
+        if pubkey is None:
+            pubkey = PubKey(data)
+        return pubkey
+
+
+class ProgramAddressCache:
+    # A bounded lru cache of program derived addresses, keyed by the program and the seeds. If a path is given, new
+    # entries are also appended to that file and loaded back on the next start, so a restarted process is warm. Each
+    # line of the file is a json array of [program, seeds, address, bump], bytes are hex encoded. The file is compacted
+    # to the entries held in memory when it is loaded and whenever it grows past twice the size, so it stays bounded.
+    # Only the process which created the cache writes the file, forked worker processes keep their entries in memory.
+
+    def __init__(self, size: int, path: str | None) -> None:
+        self.size = size
+        self.path = path
+        self.data = collections.OrderedDict()
+        self.file = None
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        # Number of lines in the file.
+        self.rows = 0
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    # A line cut short by a crash is skipped.
+                    try:
+                        program, seeds, data, bump = json.loads(line)
+                    except ValueError:
+                        continue
+                    key = (bytes.fromhex(program), tuple(bytes.fromhex(e) for e in seeds))
+                    self.save(key, (bytes.fromhex(data), bump))
+                    self.rows += 1
+            if self.rows > len(self.data):
+                self.compact()
+
+    def close(self) -> None:
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+
+    def compact(self) -> None:
+        # Rewrite the file with the entries held in memory, from the least to the most recently used. The new file
+        # replaces the old one atomically.
+        if self.file:
+            self.file.close()
+            self.file = None
+        with open(self.path + '.tmp', 'w') as f:
+            for key, val in self.data.items():
+                f.write(self.line(key, val))
+        os.replace(self.path + '.tmp', self.path)
+        self.rows = len(self.data)
+
+    def get(self, key: typing.Tuple[bytes, typing.Tuple[bytes]]) -> typing.Tuple[bytes, int] | None:
+        with self.lock:
+            if key not in self.data:
+                return None
+            self.data.move_to_end(key)
+            return self.data[key]
+
+    def line(self, key: typing.Tuple[bytes, typing.Tuple[bytes]], val: typing.Tuple[bytes, int]) -> str:
+        return json.dumps([key[0].hex(), [e.hex() for e in key[1]], val[0].hex(), val[1]]) + '\n'
+
+    def put(self, key: typing.Tuple[bytes, typing.Tuple[bytes]], val: typing.Tuple[bytes, int]) -> None:
+        with self.lock:
+            # Entries already held are only refreshed, they are not written again.
+            if key in self.data:
+                self.data.move_to_end(key)
+                return
+            self.save(key, val)
+            if not self.path or os.getpid() != self.pid:
+                return
+            if self.rows >= 2 * self.size:
+                self.compact()
+                return
+            if self.file is None:
+                self.file = open(self.path, 'a')
+            self.file.write(self.line(key, val))
+            self.file.flush()
+            self.rows += 1
+
+    def save(self, key: typing.Tuple[bytes, typing.Tuple[bytes]], val: typing.Tuple[bytes, int]) -> None:
+        # Insert an entry in memory, evicting the least recently used entries beyond the size limit.
+        self.data[key] = val
+        self.data.move_to_end(key)
+        while len(self.data) > self.size:
+            self.data.popitem(last=False)
+
+
+# The default cache used by PubKey.find_program_address. Replace it to change the size or to persist it on disk.
+program_address_cache = ProgramAddressCache(65536, None)
+
+
+class AddressLookupTable:
+    # An address lookup table is an account holding a list of addresses, so that v0 transactions can refer to accounts
+    # with a one-byte index instead of the full 32-byte public key.
+    # See: https://github.com/anza-xyz/agave/blob/master/sdk/program/src/address_lookup_table/state.rs
+
+    size_metadata = 56  # Size of the serialized table metadata, the addresses follow it.
+
+    def __init__(
+        self,
+        pubkey: PubKey,
+        authority: PubKey | None,
+        deactivation_slot: int,
+        last_extended_slot: int,
+        last_extended_slot_start_index: int,
+        addresses: typing.List[PubKey],
+    ) -> None:
+        # The address of the table account itself.
+        self.pubkey = pubkey
+        # The authority allowed to extend, freeze, deactivate and close the table, none if the table is frozen.
+        self.authority = authority
+        # The slot the table was deactivated in, or u64 max while the table is active.
+        self.deactivation_slot = deactivation_slot
+        # Addresses appended in the last extended slot can not be used until the next slot.
+        self.last_extended_slot = last_extended_slot
+        self.last_extended_slot_start_index = last_extended_slot_start_index
+        self.addresses = addresses
+        # Maps each address to its first index in the table.
+        self.address_dict: typing.Dict[PubKey, int] = {}
+        for i, e in enumerate(addresses):
+            self.address_dict.setdefault(e, i)
+
+    def __repr__(self) -> str:
+        return json.dumps(self.json())
+
+    def json(self) -> typing.Dict:
+        return {
+            'pubkey': self.pubkey.base58(),
+            'authority': self.authority.base58() if self.authority else None,
+            'deactivation_slot': self.deactivation_slot,
+            'last_extended_slot': self.last_extended_slot,
+            'last_extended_slot_start_index': self.last_extended_slot_start_index,
+            'addresses': [e.base58() for e in self.addresses],
+        }
+
+    def serialize(self) -> bytearray:
+        r = bytearray([0x01, 0x00, 0x00, 0x00])
+        r.extend(bytearray(self.deactivation_slot.to_bytes(8, 'little')))
+        r.extend(bytearray(self.last_extended_slot.to_bytes(8, 'little')))
+        r.append(self.last_extended_slot_start_index)
+        r.append(1 if self.authority else 0)
+        r.extend(self.authority.p if self.authority else bytearray(32))
+        r.extend(bytearray(2))
+        for e in self.addresses:
+            r.extend(e.p)
+        return r
+
+    @classmethod
+    def serialize_decode(cls, pubkey: PubKey, data: bytearray) -> typing.Self:
+        # Decode the data of the table account at the given address.
+        assert len(data) >= AddressLookupTable.size_metadata
+        assert (len(data) - AddressLookupTable.size_metadata) % 32 == 0
+        assert int.from_bytes(data[0:4], 'little') == 1
+        return AddressLookupTable(
+            pubkey,
+            PubKey(bytearray(data[22:54])) if data[21] else None,
+            int.from_bytes(data[4:12], 'little'),
+            int.from_bytes(data[12:20], 'little'),
+            data[20],
+            [PubKey.shared(bytes(data[i:i + 32])) for i in range(AddressLookupTable.size_metadata, len(data), 32)],
+        )
+
+
+class AddressLookupTableCache:
+    # Known address lookup tables by address, so compiling a v0 transaction against them needs no rpc round trip. An
+    # active table can only be appended to, so a cached table stays valid for the addresses it holds.
+
+    def __init__(self) -> None:
+        self.data: typing.Dict[PubKey, AddressLookupTable] = {}
+        self.lock = threading.Lock()
+
+    def get(self, pubkey: PubKey) -> AddressLookupTable | None:
+        with self.lock:
+            return self.data.get(pubkey)
+
+    def pop(self, pubkey: PubKey) -> None:
+        with self.lock:
+            self.data.pop(pubkey, None)
+
+    def put(self, table: AddressLookupTable) -> None:
+        with self.lock:
+            self.data[table.pubkey] = table
+
+
+# The default cache of address lookup tables, filled by pxsol.wallet.Wallet when it creates or extends a table.
+address_lookup_table_cache = AddressLookupTableCache()
+
 
 class AccountMeta:
     # Describes a single account with it's mode. The bit 0 distinguishes whether the account is writable; the bit 1
@@ -177,12 +447,141 @@ class Requisition:
         }
 
 
+class ComputeUnitCache:
+    # Compute units consumed by each transaction shape, as observed by simulation. The shape of a transaction is the
+    # list of its invoked programs, with the modes of their accounts, the length of their data and its first four
+    # bytes, which usually hold the instruction discriminator, plus whether a compute unit price is set, since the
+    # price instruction consumes compute units too. Transactions that only differ in recipients, amounts or blockhash
+    # share a shape.
+
+    def __init__(self) -> None:
+        self.data: typing.Dict[typing.Tuple, int] = {}
+        self.lock = threading.Lock()
+
+    def get(self, key: typing.Tuple) -> int | None:
+        with self.lock:
+            return self.data.get(key)
+
+    def put(self, key: typing.Tuple, units: int) -> None:
+        with self.lock:
+            self.data[key] = units
+
+    @classmethod
+    def shape(cls, data: typing.List[Requisition], price: bool = False) -> typing.Tuple:
+        return price, tuple((r.program, tuple(a.mode for a in r.account), len(r.data), bytes(r.data[:4])) for r in data)
+
+
+# The default cache used by pxsol.wallet.Wallet.compute_budget.
+compute_unit_cache = ComputeUnitCache()
+
+
+class ProgramAddressLookupTable:
+    # The address lookup table program creates and manages the tables used by v0 transactions.
+    # See: https://github.com/anza-xyz/agave/blob/master/sdk/program/src/address_lookup_table/instruction.rs
+
+    pubkey = PubKey.intern(PubKey.base58_decode('AddressLookupTab1e1111111111111111111111111'))
+
+    @classmethod
+    def create_lookup_table(cls, recent_slot: int, bump: int) -> bytearray:
+        # Create an address lookup table. The table address is derived from the authority and the recent slot, see
+        # ProgramAddressLookupTable.derive. Account references:
+        # 0. -w uninitialized address lookup table account.
+        # 1. sr account used to derive and control the new address lookup table.
+        # 2. sw account that will fund the new address lookup table.
+        # 3. -r system program for cpi.
+        r = bytearray([0x00, 0x00, 0x00, 0x00])
+        r.extend(bytearray(recent_slot.to_bytes(8, 'little')))
+        r.append(bump)
+        return r
+
+    @classmethod
+    def freeze_lookup_table(cls) -> bytearray:
+        # Permanently freeze an address lookup table, making it immutable. Account references:
+        # 0. -w address lookup table account to freeze.
+        # 1. sr current authority.
+        r = bytearray([0x01, 0x00, 0x00, 0x00])
+        return r
+
+    @classmethod
+    def extend_lookup_table(cls, addresses: typing.List[PubKey]) -> bytearray:
+        # Extend an address lookup table with new addresses. Funding account and system program account references are
+        # only required if the lookup table account requires additional lamports to cover the rent-exempt balance
+        # after being extended. Account references:
+        # 0. -w address lookup table account to extend.
+        # 1. sr current authority.
+        # 2. sw account that will fund the table reallocation, optional.
+        # 3. -r system program for cpi, optional.
+        r = bytearray([0x02, 0x00, 0x00, 0x00])
+        r.extend(bytearray(len(addresses).to_bytes(8, 'little')))
+        for e in addresses:
+            r.extend(e.p)
+        return r
+
+    @classmethod
+    def deactivate_lookup_table(cls) -> bytearray:
+        # Deactivate an address lookup table, making it unusable and eligible for closure after a short period of time.
+        # Account references:
+        # 0. -w address lookup table account to deactivate.
+        # 1. sr current authority.
+        r = bytearray([0x03, 0x00, 0x00, 0x00])
+        return r
+
+    @classmethod
+    def close_lookup_table(cls) -> bytearray:
+        # Close an address lookup table account. Account references:
+        # 0. -w address lookup table account to close.
+        # 1. sr current authority.
+        # 2. -w recipient of closed account lamports.
+        r = bytearray([0x04, 0x00, 0x00, 0x00])
+        return r
+
+    @classmethod
+    def derive(cls, authority: PubKey, recent_slot: int) -> typing.Tuple[PubKey, int]:
+        # Derive the address and bump seed of the table created by the authority at the recent slot.
+        return cls.pubkey.find_program_address([authority.p, bytearray(recent_slot.to_bytes(8, 'little'))])
+
+
+class ProgramComputeBudget:
+    # The compute budget program sets the compute unit limit, the priority fee and the heap size of a transaction. Its
+    # instructions take no accounts, and each kind may appear at most once in a transaction.
+    # See: https://github.com/anza-xyz/agave/blob/master/sdk/src/compute_budget.rs
+
+    pubkey = PubKey.intern(PubKey.base58_decode('ComputeBudget111111111111111111111111111111'))
+
+    units_default = 200000  # Compute units given to each instruction when no limit is set.
+    units_max = 1400000  # Maximum compute units of a transaction.
+
+    @classmethod
+    def request_heap_frame(cls, size: int) -> bytearray:
+        # Request a specific transaction-wide program heap region size in bytes. The value requested must be a multiple
+        # of 1024. This new heap region size applies to each program executed in the transaction, including all calls
+        # to cpis.
+        r = bytearray([0x01])
+        r.extend(bytearray(size.to_bytes(4, 'little')))
+        return r
+
+    @classmethod
+    def set_compute_unit_limit(cls, units: int) -> bytearray:
+        # Set a specific compute unit limit that the transaction is allowed to consume.
+        r = bytearray([0x02])
+        r.extend(bytearray(units.to_bytes(4, 'little')))
+        return r
+
+    @classmethod
+    def set_compute_unit_price(cls, price: int) -> bytearray:
+        # Set a compute unit price in micro-lamports to pay a higher transaction fee for higher transaction
+        # prioritization. The priority fee is the price times the compute unit limit.
+        r = bytearray([0x03])
+        r.extend(bytearray(price.to_bytes(8, 'little')))
+        return r
+
+
 class ProgramLoaderUpgradeable:
     # The bpf loader program is the program that owns all executable accounts on solana. When you deploy a program, the
     # owner of the program account is set to the the bpf loader program.
     # See: https://github.com/anza-xyz/agave/blob/master/sdk/program/src/loader_upgradeable_instruction.rs
 
-    pubkey = PubKey.base58_decode('BPFLoaderUpgradeab1e11111111111111111111111')
+    pubkey = PubKey.intern(PubKey.base58_decode('BPFLoaderUpgradeab1e11111111111111111111111'))
 
     size_uninitialized = 4  # Size of a serialized program account.
     size_buffer_metadata = 37  # Size of a buffer account's serialized metadata.
@@ -283,7 +682,7 @@ class ProgramSystem:
     # See: https://github.com/anza-xyz/agave/blob/master/sdk/program/src/system_instruction.rs
     # See: https://github.com/solana-program/system/blob/main/interface/src/instruction.rs
 
-    pubkey = PubKey(bytearray(32))
+    pubkey = PubKey.intern(PubKey(bytearray(32)))
 
     @classmethod
     def create_account(cls, value: int, space: int, owner: PubKey) -> bytearray:
@@ -318,14 +717,34 @@ class ProgramSysvarClock:
     # The Clock sysvar contains data on cluster time, including the current slot, epoch, and estimated wall-clock unix
     # timestamp. It is updated every slot.
 
-    pubKey = PubKey.base58_decode('SysvarC1ock11111111111111111111111111111111')
+    pubKey = PubKey.intern(PubKey.base58_decode('SysvarC1ock11111111111111111111111111111111'))
 
 
 class ProgramSysvarRent:
     # The rent sysvar contains the rental rate. Currently, the rate is static and set in genesis. The rent burn
     # percentage is modified by manual feature activation.
 
-    pubkey = PubKey.base58_decode('SysvarRent111111111111111111111111111111111')
+    pubkey = PubKey.intern(PubKey.base58_decode('SysvarRent111111111111111111111111111111111'))
+
+
+def derive_many(
+    program: PubKey,
+    seeds: typing.Iterable[bytearray],
+    workers: int | None = None,
+) -> typing.Iterator[PubKey]:
+    # Derive program addresses for many seeds on a process pool, the results are yielded in input order. Workers
+    # defaults to the number of cpus. Worker processes don't write the file of program_address_cache, the results are
+    # put into the cache of this process.
+    a, b = itertools.tee([bytes(e)] for e in seeds)
+    for seed, (pubkey, bump) in zip(a, pxsol.parallel.imap(program.find_program_address, b, workers, 256)):
+        program_address_cache.put((bytes(program.p), tuple(seed)), (bytes(pubkey.p), bump))
+        yield pubkey
+
+
+def pubkey_many(prikeys: typing.Iterable[PriKey], workers: int | None = None) -> typing.Iterator[PubKey]:
+    # Compute public keys for many private keys on a process pool, the results are yielded in input order. Workers
+    # defaults to the number of cpus.
+    return pxsol.parallel.imap(PriKey.pubkey, prikeys, workers, 256)
 
 
 def compact_u16_encode(n: int) -> bytearray:
@@ -349,8 +768,23 @@ def compact_u16_encode(n: int) -> bytearray:
     raise Exception
 
 
+def compact_u16_encode_into(data: bytearray, n: int) -> None:
+    # Append a compact u16 to the buffer, without allocating an intermediate bytearray.
+    assert n >= 0
+    assert n <= 0xffff
+    while n > 0x7f:
+        data.append(n & 0x7f | 0x80)
+        n >>= 7
+    data.append(n)
+
+
+def compact_u16_size(n: int) -> int:
+    # Number of bytes used by the compact u16 encoding of n.
+    return 1 if n <= 0x7f else 2 if n <= 0x3fff else 3
+
+
 def compact_u16_decode(data: bytearray) -> int:
-    return compact_u16_decode_reader(io.BytesIO(data))
+    return compact_u16_decode_view(memoryview(data), 0)[0]
 
 
 def compact_u16_decode_reader(reader: typing.BinaryIO) -> int:
@@ -368,6 +802,21 @@ def compact_u16_decode_reader(reader: typing.BinaryIO) -> int:
     return n
 
 
+def compact_u16_decode_view(data: memoryview, offset: int) -> typing.Tuple[int, int]:
+    # Decode a compact u16 at the given offset, returns the value and the offset just past it.
+    c = data[offset]
+    if c <= 0x7f:
+        return c, offset + 1
+    n = c & 0x7f
+    c = data[offset + 1]
+    n += (c & 0x7f) << 7
+    if c <= 0x7f:
+        return n, offset + 2
+    c = data[offset + 2]
+    n += c << 14
+    return n, offset + 3
+
+
 class Instruction:
     # A compact encoding of an instruction.
 
@@ -393,17 +842,28 @@ class Instruction:
 
     def serialize(self) -> bytearray:
         r = bytearray()
-        r.append(self.program)
-        r.extend(compact_u16_encode(len(self.account)))
-        for e in self.account:
-            r.append(e)
-        r.extend(compact_u16_encode(len(self.data)))
-        r.extend(self.data)
+        self.serialize_into(r)
         return r
 
+    def serialize_into(self, data: bytearray) -> None:
+        # Append the instruction to the buffer.
+        data.append(self.program)
+        compact_u16_encode_into(data, len(self.account))
+        data.extend(self.account)
+        compact_u16_encode_into(data, len(self.data))
+        data.extend(self.data)
+
+    def serialized_size(self) -> int:
+        a = len(self.account)
+        b = len(self.data)
+        return 1 + compact_u16_size(a) + a + compact_u16_size(b) + b
+
     @classmethod
     def serialize_decode(cls, data: bytearray) -> typing.Self:
-        return Instruction.serialize_decode_reader(io.BytesIO(data))
+        # The data field is copied out of the input, see serialize_decode_view to avoid the copy.
+        i = Instruction.serialize_decode_view(memoryview(data), 0)[0]
+        i.data = bytearray(i.data)
+        return i
 
     @classmethod
     def serialize_decode_reader(cls, reader: io.BytesIO) -> typing.Self:
@@ -414,6 +874,18 @@ class Instruction:
         i.data = bytearray(reader.read(compact_u16_decode_reader(reader)))
         return i
 
+    @classmethod
+    def serialize_decode_view(cls, data: memoryview, offset: int) -> typing.Tuple[typing.Self, int]:
+        # Decode an instruction at the given offset without copying, the data field is a view into the input. Returns
+        # the instruction and the offset just past it.
+        program = data[offset]
+        n, offset = compact_u16_decode_view(data, offset + 1)
+        assert offset + n <= len(data)
+        account = list(data[offset:offset + n])
+        n, offset = compact_u16_decode_view(data, offset + n)
+        assert offset + n <= len(data)
+        return Instruction(program, account, data[offset:offset + n]), offset + n
+
 
 class MessageHeader:
     # The message header specifies the privileges of accounts included in the transaction's account address array. It
@@ -479,30 +951,203 @@ class Message:
 
     def serialize(self) -> bytearray:
         r = bytearray()
-        r.extend(self.header.serialize())
-        r.extend(compact_u16_encode(len(self.account_keys)))
+        self.serialize_into(r)
+        return r
+
+    def serialize_into(self, data: bytearray) -> None:
+        # Append the message to the buffer.
+        data.append(self.header.required_signatures)
+        data.append(self.header.readonly_signatures)
+        data.append(self.header.readonly)
+        compact_u16_encode_into(data, len(self.account_keys))
         for e in self.account_keys:
-            r.extend(e.p)
-        r.extend(self.recent_blockhash)
-        r.extend(compact_u16_encode(len(self.instructions)))
+            data.extend(e.p)
+        data.extend(self.recent_blockhash)
+        compact_u16_encode_into(data, len(self.instructions))
         for e in self.instructions:
-            r.extend(e.serialize())
-        return r
+            e.serialize_into(data)
+
+    def serialized_size(self) -> int:
+        a = len(self.account_keys)
+        b = len(self.instructions)
+        c = sum(e.serialized_size() for e in self.instructions)
+        return 3 + compact_u16_size(a) + a * 32 + 32 + compact_u16_size(b) + c
 
     @classmethod
     def serialize_decode(cls, data: bytearray) -> typing.Self:
-        return Message.serialize_decode_reader(io.BytesIO(data))
+        # The blockhash and the instruction data are copied out of the input, see serialize_decode_view to avoid the
+        # copies.
+        m = Message.serialize_decode_view(memoryview(data), 0)[0]
+        m.recent_blockhash = bytearray(m.recent_blockhash)
+        for i in m.instructions:
+            i.data = bytearray(i.data)
+        return m
 
     @classmethod
     def serialize_decode_reader(cls, reader: io.BytesIO) -> typing.Self:
+        # Versioned messages are dispatched on the prefix byte, see MessageV0.
+        if reader.read(1)[0] & 0x80:
+            reader.seek(-1, io.SEEK_CUR)
+            return MessageV0.serialize_decode_reader(reader)
+        reader.seek(-1, io.SEEK_CUR)
         m = Message(MessageHeader.serialize_decode_reader(reader), [], bytearray(), [])
         for _ in range(compact_u16_decode_reader(reader)):
-            m.account_keys.append(PubKey(bytearray(reader.read(32))))
+            m.account_keys.append(PubKey.shared(reader.read(32)))
         m.recent_blockhash = bytearray(reader.read(32))
         for _ in range(compact_u16_decode_reader(reader)):
             m. instructions.append(Instruction.serialize_decode_reader(reader))
         return m
 
+    @classmethod
+    def serialize_decode_view(cls, data: memoryview, offset: int) -> typing.Tuple[typing.Self, int]:
+        # Decode a message at the given offset. The blockhash and the instruction data are views into the input, only
+        # account keys are materialized. Returns the message and the offset just past it. Versioned messages are
+        # dispatched on the prefix byte, see MessageV0.
+        assert offset + 3 <= len(data)
+        if data[offset] & 0x80:
+            return MessageV0.serialize_decode_view(data, offset)
+        m = Message(MessageHeader(data[offset], data[offset + 1], data[offset + 2]), [], bytearray(), [])
+        n, offset = compact_u16_decode_view(data, offset + 3)
+        assert offset + n * 32 + 32 <= len(data)
+        keys = data[offset:offset + n * 32].tobytes()
+        for i in range(0, n * 32, 32):
+            m.account_keys.append(PubKey.shared(keys[i:i + 32]))
+        offset += n * 32
+        m.recent_blockhash = data[offset:offset + 32]
+        n, offset = compact_u16_decode_view(data, offset + 32)
+        for _ in range(n):
+            i, offset = Instruction.serialize_decode_view(data, offset)
+            m.instructions.append(i)
+        return m, offset
+
+
+class MessageAddressTableLookup:
+    # Accounts loaded by a v0 message from an address lookup table, as u8 indexes into the table. The loaded addresses
+    # follow the account keys of the message: first the writable ones of every lookup, then the readonly ones.
+
+    def __init__(
+        self,
+        account_key: PubKey,
+        writable_indexes: typing.List[int],
+        readonly_indexes: typing.List[int],
+    ) -> None:
+        self.account_key = account_key
+        self.writable_indexes = writable_indexes
+        self.readonly_indexes = readonly_indexes
+
+    def __repr__(self) -> str:
+        return json.dumps(self.json())
+
+    def json(self) -> typing.Dict:
+        return {
+            'account_key': self.account_key.base58(),
+            'writable_indexes': self.writable_indexes,
+            'readonly_indexes': self.readonly_indexes,
+        }
+
+    def serialize(self) -> bytearray:
+        r = bytearray()
+        self.serialize_into(r)
+        return r
+
+    def serialize_into(self, data: bytearray) -> None:
+        # Append the lookup to the buffer.
+        data.extend(self.account_key.p)
+        compact_u16_encode_into(data, len(self.writable_indexes))
+        data.extend(self.writable_indexes)
+        compact_u16_encode_into(data, len(self.readonly_indexes))
+        data.extend(self.readonly_indexes)
+
+    def serialized_size(self) -> int:
+        a = len(self.writable_indexes)
+        b = len(self.readonly_indexes)
+        return 32 + compact_u16_size(a) + a + compact_u16_size(b) + b
+
+    @classmethod
+    def serialize_decode(cls, data: bytearray) -> typing.Self:
+        return MessageAddressTableLookup.serialize_decode_view(memoryview(data), 0)[0]
+
+    @classmethod
+    def serialize_decode_reader(cls, reader: io.BytesIO) -> typing.Self:
+        e = MessageAddressTableLookup(PubKey.shared(reader.read(32)), [], [])
+        e.writable_indexes = list(reader.read(compact_u16_decode_reader(reader)))
+        e.readonly_indexes = list(reader.read(compact_u16_decode_reader(reader)))
+        return e
+
+    @classmethod
+    def serialize_decode_view(cls, data: memoryview, offset: int) -> typing.Tuple[typing.Self, int]:
+        # Decode a lookup at the given offset, returns the lookup and the offset just past it.
+        assert offset + 32 <= len(data)
+        e = MessageAddressTableLookup(PubKey.shared(data[offset:offset + 32].tobytes()), [], [])
+        n, offset = compact_u16_decode_view(data, offset + 32)
+        assert offset + n <= len(data)
+        e.writable_indexes = list(data[offset:offset + n])
+        n, offset = compact_u16_decode_view(data, offset + n)
+        assert offset + n <= len(data)
+        e.readonly_indexes = list(data[offset:offset + n])
+        return e, offset + n
+
+
+class MessageV0(Message):
+    # A version 0 message. Besides the fields of a legacy message, it loads accounts from address lookup tables, which
+    # lifts the limit on the number of accounts a transaction can reference. The serialized message is prefixed with a
+    # byte whose top bit marks a versioned message and whose low bits hold the version number.
+    # See: https://solana.com/docs/advanced/versions
+
+    def __init__(
+        self,
+        header: MessageHeader,
+        account_keys: typing.List[PubKey],
+        recent_blockhash: bytearray,
+        instructions: typing.List[Instruction],
+        address_table_lookups: typing.List[MessageAddressTableLookup],
+    ) -> None:
+        super().__init__(header, account_keys, recent_blockhash, instructions)
+        self.address_table_lookups = address_table_lookups
+
+    def json(self) -> typing.Dict:
+        r = super().json()
+        r['address_table_lookups'] = [e.json() for e in self.address_table_lookups]
+        return r
+
+    def serialize_into(self, data: bytearray) -> None:
+        data.append(0x80)
+        super().serialize_into(data)
+        compact_u16_encode_into(data, len(self.address_table_lookups))
+        for e in self.address_table_lookups:
+            e.serialize_into(data)
+
+    def serialized_size(self) -> int:
+        a = len(self.address_table_lookups)
+        b = sum(e.serialized_size() for e in self.address_table_lookups)
+        return 1 + super().serialized_size() + compact_u16_size(a) + b
+
+    @classmethod
+    def serialize_decode(cls, data: bytearray) -> typing.Self:
+        assert data[0] == 0x80
+        return Message.serialize_decode(data)
+
+    @classmethod
+    def serialize_decode_reader(cls, reader: io.BytesIO) -> typing.Self:
+        assert reader.read(1)[0] == 0x80
+        m = Message.serialize_decode_reader(reader)
+        m = MessageV0(m.header, m.account_keys, m.recent_blockhash, m.instructions, [])
+        for _ in range(compact_u16_decode_reader(reader)):
+            m.address_table_lookups.append(MessageAddressTableLookup.serialize_decode_reader(reader))
+        return m
+
+    @classmethod
+    def serialize_decode_view(cls, data: memoryview, offset: int) -> typing.Tuple[typing.Self, int]:
+        # Decode a version 0 message at the given offset, returns the message and the offset just past it.
+        assert data[offset] == 0x80
+        m, offset = Message.serialize_decode_view(data, offset + 1)
+        m = MessageV0(m.header, m.account_keys, m.recent_blockhash, m.instructions, [])
+        n, offset = compact_u16_decode_view(data, offset)
+        for _ in range(n):
+            e, offset = MessageAddressTableLookup.serialize_decode_view(data, offset)
+            m.address_table_lookups.append(e)
+        return m, offset
+
 
 class Transaction:
     # An atomically-committed sequence of instructions.
@@ -510,6 +1155,9 @@ class Transaction:
     def __init__(self, signatures: typing.List[bytearray], message: Message) -> None:
         self.signatures = signatures
         self.message = message
+        # The message and its bytes as last signed, set by sign. Serialize embeds these bytes, so that the message is
+        # not serialized twice and the transaction always carries the message its signatures cover.
+        self.signed: typing.Tuple[Message, bytes] | None = None
 
     def __repr__(self) -> str:
         return json.dumps(self.json())
@@ -530,43 +1178,87 @@ class Transaction:
         return r
 
     @classmethod
-    def requisition_decode(cls, pubkey: PubKey, data: typing.List[Requisition]) -> typing.Self:
-        # Convert the requisitions to transaction.
-        account_flat: typing.List[AccountMeta] = [AccountMeta(pubkey, 3)]
+    def requisition_decode(
+        cls,
+        pubkey: PubKey,
+        data: typing.List[Requisition],
+        tables: typing.List[AddressLookupTable] | None = None,
+    ) -> typing.Self:
+        # Convert the requisitions to transaction. The fee payer comes first, duplicated accounts are merged by or-ing
+        # their modes, in the order they first appear. The account metas owned by the caller are left untouched.
+        #
+        # If address lookup tables are given, a v0 message is compiled instead of a legacy one. Accounts that are
+        # neither signers nor invoked programs are then loaded from the first table holding them.
+        account_mode: typing.Dict[PubKey, int] = {pubkey: 3}
         for r in data:
-            account_flat.append(AccountMeta(r.program, 0))
-            account_flat.extend(r.account)
-        account_list: typing.List[AccountMeta] = []
-        account_dict: typing.Dict[PubKey, int] = {}
-        for a in account_flat:
-            if a.pubkey not in account_dict:
-                account_list.append(a)
-                account_dict[a.pubkey] = len(account_list) - 1
-                continue
-            account_list[account_dict[a.pubkey]].mode |= a.mode
-        account_list.sort(key=lambda x: x.mode, reverse=True)
-        tx = pxsol.core.Transaction([], pxsol.core.Message(pxsol.core.MessageHeader(0, 0, 0), [], bytearray(), []))
-        tx.message.account_keys.extend([e.pubkey for e in account_list])
-        tx.message.header.required_signatures = len([k for k in account_list if k.mode >= 2])
-        tx.message.header.readonly_signatures = len([k for k in account_list if k.mode == 2])
-        tx.message.header.readonly = len([k for k in account_list if k.mode == 0])
+            account_mode[r.program] = account_mode.get(r.program, 0)
+            for a in r.account:
+                account_mode[a.pubkey] = account_mode.get(a.pubkey, 0) | a.mode
+        # Accounts are ordered as signer-writable, signer-readonly, writable and readonly. The sort is stable, so the
+        # order of first appearance is kept within each group.
+        account_list = sorted(account_mode, key=account_mode.__getitem__, reverse=True)
+        if tables is None:
+            message = Message(MessageHeader(0, 0, 0), account_list, bytearray(), [])
+        else:
+            static: typing.List[PubKey] = []
+            lookup = [MessageAddressTableLookup(e.pubkey, [], []) for e in tables]
+            lookup_writable: typing.List[typing.List[PubKey]] = [[] for _ in tables]
+            lookup_readonly: typing.List[typing.List[PubKey]] = [[] for _ in tables]
+            program_set = {r.program for r in data}
+            for k in account_list:
+                t = -1
+                if account_mode[k] < 2 and k not in program_set:
+                    t = next((i for i, e in enumerate(tables) if k in e.address_dict), -1)
+                if t < 0:
+                    static.append(k)
+                elif account_mode[k] == 1:
+                    lookup[t].writable_indexes.append(tables[t].address_dict[k])
+                    lookup_writable[t].append(k)
+                else:
+                    lookup[t].readonly_indexes.append(tables[t].address_dict[k])
+                    lookup_readonly[t].append(k)
+            lookup = [e for e in lookup if e.writable_indexes or e.readonly_indexes]
+            message = MessageV0(MessageHeader(0, 0, 0), static, bytearray(), [], lookup)
+            account_list = static + sum(lookup_writable, []) + sum(lookup_readonly, [])
+        account_dict = {k: i for i, k in enumerate(account_list)}
+        count = [0, 0, 0, 0]
+        for k in message.account_keys:
+            count[account_mode[k]] += 1
+        message.header.required_signatures = count[2] + count[3]
+        message.header.readonly_signatures = count[2]
+        message.header.readonly = count[0]
         for r in data:
-            program = tx.message.account_keys.index(r.program)
-            account = [tx.message.account_keys.index(a.pubkey) for a in r.account]
-            tx.message.instructions.append(Instruction(program, account, r.data))
-        return tx
+            program = account_dict[r.program]
+            account = [account_dict[a.pubkey] for a in r.account]
+            message.instructions.append(Instruction(program, account, r.data))
+        return Transaction([], message)
 
     def serialize(self) -> bytearray:
         r = bytearray()
-        r.extend(compact_u16_encode(len(self.signatures)))
+        compact_u16_encode_into(r, len(self.signatures))
         for e in self.signatures:
             r.extend(e)
-        r.extend(self.message.serialize())
+        if self.signed and self.signed[0] is self.message:
+            r.extend(self.signed[1])
+        else:
+            self.message.serialize_into(r)
         return r
 
+    def serialized_size(self) -> int:
+        n = len(self.signatures)
+        if self.signed and self.signed[0] is self.message:
+            return compact_u16_size(n) + n * 64 + len(self.signed[1])
+        return compact_u16_size(n) + n * 64 + self.message.serialized_size()
+
     @classmethod
     def serialize_decode(cls, data: bytearray) -> typing.Self:
-        return Transaction.serialize_decode_reader(io.BytesIO(data))
+        # Signatures, the blockhash and the instruction data are copied out of the input, so the transaction can be
+        # modified, copied and pickled. See serialize_decode_view to avoid the copies.
+        data = memoryview(data)
+        n, offset = compact_u16_decode_view(data, 0)
+        assert offset + n * 64 <= len(data)
+        s = [bytearray(data[i:i + 64]) for i in range(offset, offset + n * 64, 64)]
+        return Transaction(s, Message.serialize_decode(data[offset + n * 64:]))
 
     @classmethod
     def serialize_decode_reader(cls, reader: io.BytesIO) -> typing.Self:
@@ -575,9 +1267,214 @@ class Transaction:
             s.append(bytearray(reader.read(64)))
         return Transaction(s, Message.serialize_decode_reader(reader))
 
+    @classmethod
+    def serialize_decode_view(cls, data: memoryview, offset: int) -> typing.Tuple[typing.Self, int]:
+        # Decode a transaction at the given offset without copying, signatures are views into the input. Returns the
+        # transaction and the offset just past it.
+        n, offset = compact_u16_decode_view(data, offset)
+        assert offset + n * 64 <= len(data)
+        s = [data[i:i + 64] for i in range(offset, offset + n * 64, 64)]
+        m, offset = Message.serialize_decode_view(data, offset + n * 64)
+        return Transaction(s, m), offset
+
     def sign(self, prikey: typing.List[PriKey]) -> None:
         # Sign the transaction using the given private keys.
         assert self.message.header.required_signatures == len(prikey)
         m = self.message.serialize()
+        self.signed = (self.message, bytes(m))
         for k in prikey:
             self.signatures.append(k.sign(m))
+
+
+class TransactionView:
+    # A lazy, read-only view over a serialized transaction. Only the signature count, the message header and the offsets
+    # of the account keys, the recent blockhash and the instructions are parsed up front, every field is decoded on
+    # access. Use it to filter large numbers of transactions cheaply, then call transaction() on the few you keep.
+
+    def __init__(self, data: bytearray) -> None:
+        self.data = memoryview(bytes(data))
+        n, offset = compact_u16_decode_view(self.data, 0)
+        self.signature_count = n
+        self.signature_offset = offset
+        self.message_offset = offset + n * 64
+        assert self.message_offset + 4 <= len(self.data)
+        # The message version, none for legacy messages. Only the static account keys are visible through the view,
+        # accounts loaded from address lookup tables are not.
+        self.version = None
+        offset = self.message_offset
+        if self.data[offset] & 0x80:
+            self.version = self.data[offset] & 0x7f
+            assert self.version == 0
+            offset += 1
+        self.header = MessageHeader(*self.data[offset:offset + 3])
+        n, offset = compact_u16_decode_view(self.data, offset + 3)
+        assert offset + n * 32 + 32 <= len(self.data)
+        self.account_count = n
+        self.account_offset = offset
+        self.recent_blockhash_offset = offset + n * 32
+        n, offset = compact_u16_decode_view(self.data, self.recent_blockhash_offset + 32)
+        self.instruction_count = n
+        # Offsets of each instruction, only computed on the first instruction access.
+        self.instruction_offset: typing.List[int] = [offset]
+
+    def account_index(self, pubkey: PubKey) -> int:
+        # Find the index of the account key in the message without decoding any key, or -1 if it is not present.
+        for i in range(self.account_count):
+            j = self.account_offset + i * 32
+            if self.data[j:j + 32] == pubkey.p:
+                return i
+        return -1
+
+    def account_key(self, i: int) -> PubKey:
+        assert i < self.account_count
+        j = self.account_offset + i * 32
+        return PubKey.shared(self.data[j:j + 32].tobytes())
+
+    def instruction(self, i: int) -> Instruction:
+        assert i < self.instruction_count
+        offset = self.instruction_offset
+        while len(offset) <= i:
+            offset.append(Instruction.serialize_decode_view(self.data, offset[-1])[1])
+        return Instruction.serialize_decode_view(self.data, offset[i])[0]
+
+    def message(self) -> memoryview:
+        # The serialized message, which is the payload covered by the signatures.
+        return self.data[self.message_offset:]
+
+    def recent_blockhash(self) -> memoryview:
+        return self.data[self.recent_blockhash_offset:self.recent_blockhash_offset + 32]
+
+    def signature(self, i: int) -> memoryview:
+        assert i < self.signature_count
+        j = self.signature_offset + i * 64
+        return self.data[j:j + 64]
+
+    def transaction(self) -> Transaction:
+        # Materialize the full transaction, its fields are copied out of the view.
+        return Transaction.serialize_decode(self.data)
+
+
+class TransactionTemplate:
+    # A transaction compiled once for many structurally identical sends. The message is kept serialized, and the byte
+    # offsets of the recent blockhash, the account keys and the instruction data are recorded, so that a new signed
+    # transaction is a buffer patch plus signing. Patched fields must keep their size, and account keys must stay
+    # distinct. For v0 messages only the static account keys can be patched, the address table lookups are fixed.
+
+    def __init__(self, tx: Transaction) -> None:
+        m = tx.message
+        assert len(m.recent_blockhash) == 32
+        self.message = bytearray(m.serialize())
+        self.signature_count = m.header.required_signatures
+        self.account_dict = {k: i for i, k in enumerate(m.account_keys)}
+        self.account_keys = list(m.account_keys)
+        self.account_offset = (1 if isinstance(m, MessageV0) else 0) + 3 + compact_u16_size(len(m.account_keys))
+        self.recent_blockhash_offset = self.account_offset + len(m.account_keys) * 32
+        offset = self.recent_blockhash_offset + 32 + compact_u16_size(len(m.instructions))
+        self.instruction_data_offset: typing.List[int] = []
+        self.instruction_data_size: typing.List[int] = []
+        for e in m.instructions:
+            offset += 1 + compact_u16_size(len(e.account)) + len(e.account) + compact_u16_size(len(e.data))
+            self.instruction_data_offset.append(offset)
+            self.instruction_data_size.append(len(e.data))
+            offset += len(e.data)
+        if isinstance(m, MessageV0):
+            offset += compact_u16_size(len(m.address_table_lookups))
+            offset += sum(e.serialized_size() for e in m.address_table_lookups)
+        assert offset == len(self.message)
+
+    @classmethod
+    def requisition_decode(
+        cls,
+        pubkey: PubKey,
+        data: typing.List[Requisition],
+        tables: typing.List[AddressLookupTable] | None = None,
+    ) -> typing.Self:
+        # Compile the requisitions to a template. The account keys and data used here are placeholders to be patched.
+        # See Transaction.requisition_decode for the address lookup tables.
+        tx = Transaction.requisition_decode(pubkey, data, tables)
+        tx.message.recent_blockhash = bytearray(32)
+        return TransactionTemplate(tx)
+
+    def account_index(self, pubkey: PubKey) -> int:
+        return self.account_dict[pubkey]
+
+    def patch_account_key(self, i: int, pubkey: PubKey) -> None:
+        # Replace the account key at index i. The new key must not already be used by another account.
+        j = self.account_dict.get(pubkey, i)
+        assert j == i
+        del self.account_dict[self.account_keys[i]]
+        self.account_dict[pubkey] = i
+        self.account_keys[i] = pubkey
+        offset = self.account_offset + i * 32
+        self.message[offset:offset + 32] = pubkey.p
+
+    def patch_instruction_data(self, i: int, data: bytearray) -> None:
+        assert len(data) == self.instruction_data_size[i]
+        offset = self.instruction_data_offset[i]
+        self.message[offset:offset + len(data)] = data
+
+    def patch_recent_blockhash(self, data: bytearray) -> None:
+        assert len(data) == 32
+        self.message[self.recent_blockhash_offset:self.recent_blockhash_offset + 32] = data
+
+    def sign(self, prikey: typing.List[PriKey]) -> bytearray:
+        # Sign the current message, returns the serialized transaction.
+        assert self.signature_count == len(prikey)
+        m = bytes(self.message)
+        r = bytearray()
+        compact_u16_encode_into(r, len(prikey))
+        for k in prikey:
+            r.extend(k.sign(m))
+        r.extend(m)
+        return r
+
+
+def requisition_pack(
+    pubkey: PubKey,
+    data: typing.Iterable[Requisition],
+    size: int = 1232,
+    cost: typing.Callable[[Requisition], int] | None = None,
+    units: int = 1400000,
+) -> typing.Iterator[Transaction]:
+    # Pack a stream of requisitions, in order, into as few transactions as possible. Each transaction is paid by the
+    # fee payer and is at most size bytes once signed, by default the packet size limit. The size is accounted
+    # incrementally from the distinct accounts, signers and instructions, nothing is serialized. If cost is given, it
+    # returns the compute units consumed by a requisition, and the total of each transaction is kept within units.
+    # Yields unsigned transactions, their signers are the first required_signatures account keys.
+    batch: typing.List[Requisition] = []
+    account_mode: typing.Dict[PubKey, int] = {pubkey: 3}
+    instruction_size = 0
+    signer_count = 1
+    units_used = 0
+    for r in data:
+        # The size and the compute units of this requisition don't depend on the transaction it goes into.
+        c = cost(r) if cost else 0
+        m = 1 + compact_u16_size(len(r.account)) + len(r.account) + compact_u16_size(len(r.data)) + len(r.data)
+        while True:
+            # The accounts of this requisition with their modes merged into the current transaction.
+            add: typing.Dict[PubKey, int] = {r.program: account_mode.get(r.program, 0)}
+            for e in r.account:
+                add[e.pubkey] = add.get(e.pubkey, account_mode.get(e.pubkey, 0)) | e.mode
+            a = len(account_mode) + len([k for k in add if k not in account_mode])
+            s = signer_count + len([k for k in add if add[k] >= 2 and account_mode.get(k, 0) < 2])
+            i = instruction_size + m
+            u = units_used + c
+            n = compact_u16_size(s) + s * 64 + 3 + compact_u16_size(a) + a * 32 + 32
+            n += compact_u16_size(len(batch) + 1) + i
+            if n <= size and u <= units:
+                break
+            # The requisition does not fit in a transaction on its own.
+            assert batch
+            yield Transaction.requisition_decode(pubkey, batch)
+            batch = []
+            account_mode = {pubkey: 3}
+            instruction_size = 0
+            signer_count = 1
+            units_used = 0
+        account_mode.update(add)
+        instruction_size = i
+        signer_count = s
+        units_used = u
+        batch.append(r)
+    if batch:
+        yield Transaction.requisition_decode(pubkey, batch)
@@ -6,6 +6,8 @@ class Fp:
     # As with any field, a finite field is a set on which the operations of multiplication, addition, subtraction and
     # division are defined and satisfy certain basic rules.
 
+    __slots__ = ['x']
+
     p = 0
 
     def __init__(self, x: int) -> None:
@@ -20,15 +22,15 @@ class Fp:
 
     def __add__(self, data: typing.Self) -> typing.Self:
         assert self.p == data.p
-        return self.__class__((self.x + data.x) % self.p)
+        return self.__class__(self.x + data.x)
 
     def __sub__(self, data: typing.Self) -> typing.Self:
         assert self.p == data.p
-        return self.__class__((self.x - data.x) % self.p)
+        return self.__class__(self.x - data.x)
 
     def __mul__(self, data: typing.Self) -> typing.Self:
         assert self.p == data.p
-        return self.__class__((self.x * data.x) % self.p)
+        return self.__class__(self.x * data.x)
 
     def __truediv__(self, data: typing.Self) -> typing.Self:
         return self * data ** -1
@@ -66,6 +68,8 @@ N = 0x1000000000000000000000000000000014def9dea2f79cd65812631a5cf5d3ed
 
 class Fq(Fp):
 
+    __slots__ = []
+
     p = P
 
     def __repr__(self) -> str:
@@ -74,6 +78,8 @@ class Fq(Fp):
 
 class Fr(Fp):
 
+    __slots__ = []
+
     p = N
 
     def __repr__(self) -> str:
@@ -82,10 +88,16 @@ class Fr(Fp):
 
 A = -Fq(1)
 D = -Fq(121665) / Fq(121666)
+# Square root of -1 modulo P.
+SQRT_M1 = pow(2, (P - 1) // 4, P)
+# The constant 2 * d as a plain integer, used by the extended coordinates.
+D2 = (D + D).x
 
 
 class Pt:
 
+    __slots__ = ['x', 'y']
+
     def __init__(self, x: Fq, y: Fq) -> None:
         assert y * y - x * x == Fq(1) + D * x * x * y * y
         self.x = x
@@ -116,18 +128,8 @@ class Pt:
         return self + data.__neg__()
 
     def __mul__(self, k: Fr) -> typing.Self:
-        # Point multiplication: Double-and-add
-        # https://en.wikipedia.org/wiki/Elliptic_curve_point_multiplication
-        n = k.x
-        result = I
-        addend = self
-        while n:
-            b = n & 1
-            if b == 1:
-                result += addend
-            addend = addend + addend
-            n = n >> 1
-        return result
+        # Point multiplication is done in extended coordinates, only a single inversion is required at the end.
+        return (PtExt.affine_decode(self) * k.x).affine()
 
     def __truediv__(self, k: Fr) -> typing.Self:
         return self.__mul__(k ** -1)
@@ -150,6 +152,211 @@ G = Pt(
     Fq(0x6666666666666666666666666666666666666666666666666666666666666658),
 )
 
+
+class PtExt:
+    # Extended twisted edwards coordinates. A point (x, y) is represented as (X:Y:Z:T) with x = X/Z, y = Y/Z and
+    # x * y = T/Z. Addition and doubling need no field inversion, so they are used internally by the scalar
+    # multiplication. Points are not checked against the curve equation, this is done by Pt at the api boundary.
+    # See https://datatracker.ietf.org/doc/html/rfc8032#section-5.1.4
+    #
+    # The coordinates are plain integers modulo P rather than Fq, and every reduction is written inline. This avoids an
+    # object allocation, an assertion and a second reduction per field operation.
+
+    __slots__ = ['x', 'y', 'z', 't']
+
+    def __init__(self, x: int, y: int, z: int, t: int) -> None:
+        self.x = x
+        self.y = y
+        self.z = z
+        self.t = t
+
+    def __repr__(self) -> str:
+        return f'PtExt(0x{self.x:064x}, 0x{self.y:064x}, 0x{self.z:064x}, 0x{self.t:064x})'
+
+    def __eq__(self, data: typing.Self) -> bool:
+        # Compare x1/z1 = x2/z2 and y1/z1 = y2/z2 without inversions.
+        return all([
+            (self.x * data.z - data.x * self.z) % P == 0,
+            (self.y * data.z - data.y * self.z) % P == 0,
+        ])
+
+    def __add__(self, data: typing.Self) -> typing.Self:
+        # Strongly unified addition, it works for doubling and the identity too.
+        x1, y1, z1, t1 = self.x, self.y, self.z, self.t
+        x2, y2, z2, t2 = data.x, data.y, data.z, data.t
+        a = (y1 - x1) * (y2 - x2) % P
+        b = (y1 + x1) * (y2 + x2) % P
+        c = t1 * t2 % P * D2 % P
+        d = z1 * z2 * 2 % P
+        e = b - a
+        f = d - c
+        g = d + c
+        h = b + a
+        return PtExt(e * f % P, g * h % P, f * g % P, e * h % P)
+
+    def __sub__(self, data: typing.Self) -> typing.Self:
+        return self + data.__neg__()
+
+    def __mul__(self, k: int) -> typing.Self:
+        # Point multiplication: Double-and-add
+        # https://en.wikipedia.org/wiki/Elliptic_curve_point_multiplication
+        result = PtExt.nil()
+        addend = self
+        while k:
+            if k & 1:
+                result += addend
+            addend = addend.double()
+            k = k >> 1
+        return result
+
+    def __pos__(self) -> typing.Self:
+        return self
+
+    def __neg__(self) -> typing.Self:
+        return PtExt(-self.x % P, self.y, self.z, -self.t % P)
+
+    def affine(self) -> Pt:
+        # Convert to affine coordinates. This is the only place an inversion happens.
+        z = pow(self.z, -1, P)
+        return Pt(Fq(self.x * z), Fq(self.y * z))
+
+    @classmethod
+    def affine_decode(cls, pt: Pt) -> typing.Self:
+        # Convert from affine coordinates.
+        return PtExt(pt.x.x, pt.y.x, 1, pt.x.x * pt.y.x % P)
+
+    def double(self) -> typing.Self:
+        # Dedicated doubling, cheaper than the unified addition.
+        x1, y1, z1 = self.x, self.y, self.z
+        a = x1 * x1 % P
+        b = y1 * y1 % P
+        c = z1 * z1 * 2 % P
+        h = a + b
+        e = h - (x1 + y1) * (x1 + y1) % P
+        g = a - b
+        f = c + g
+        return PtExt(e * f % P, g * h % P, f * g % P, e * h % P)
+
+    @classmethod
+    def nil(cls) -> typing.Self:
+        # Identity element.
+        return PtExt(0, 1, 1, 0)
+
+
+# Precomputed multiples of the generator point, built on first use by gmul(). The entry GT[i][j] is (j + 1) * 16^i * G.
+GT: typing.List[typing.List[PtExt]] = []
+
+
+def gmul(k: Fr) -> Pt:
+    # Fixed-base multiplication k * G. The scalar is recoded into 64 signed radix-16 digits in [-8, 8), so that the
+    # product is the sum of 64 table lookups and no doubling is needed.
+    # See https://ed25519.cr.yp.to/ed25519-20110926.pdf, section 4.
+    if not GT:
+        base = PtExt.affine_decode(G)
+        rows = []
+        for _ in range(64):
+            line = [base]
+            for _ in range(7):
+                line.append(line[-1] + base)
+            rows.append(line)
+            base = line[7].double()
+        GT.extend(rows)
+    n = k.x
+    result = PtExt.nil()
+    for i in range(64):
+        d = n & 15
+        n = n >> 4
+        if d >= 8:
+            d -= 16
+            n += 1
+        if d > 0:
+            result += GT[i][d - 1]
+        if d < 0:
+            result -= GT[i][-d - 1]
+    return result.affine()
+
+
+# Odd multiples of the generator point, built on first use by dmul(). The entry GW[i] is (2 * i + 1) * G.
+GW: typing.List[PtExt] = []
+
+
+def wnaf(n: int, w: int) -> typing.List[int]:
+    # Width-w non-adjacent form of n, least significant digit first. Every non-zero digit is odd and lies in
+    # (-2^(w-1), 2^(w-1)), and any w consecutive digits contain at most one non-zero digit.
+    r = []
+    while n:
+        d = 0
+        if n & 1:
+            d = n & ((1 << w) - 1)
+            if d >= 1 << (w - 1):
+                d -= 1 << w
+            n -= d
+        r.append(d)
+        n = n >> 1
+    return r
+
+
+def dmul(a: Fr, b: Fr, pt: Pt) -> Pt:
+    # Double-scalar multiplication a * G + b * pt using interleaved wNAF (Straus-Shamir). Both scalars are processed
+    # in a single pass, so the doublings are shared. The generator uses a wide window backed by a cached table.
+    if not GW:
+        g = PtExt.affine_decode(G)
+        g2 = g.double()
+        rows = [g]
+        for _ in range(63):
+            rows.append(rows[-1] + g2)
+        GW.extend(rows)
+    q = PtExt.affine_decode(pt)
+    q2 = q.double()
+    qw = [q]
+    for _ in range(7):
+        qw.append(qw[-1] + q2)
+    na = wnaf(a.x, 8)
+    nb = wnaf(b.x, 5)
+    result = PtExt.nil()
+    for i in range(max(len(na), len(nb)) - 1, -1, -1):
+        result = result.double()
+        d = na[i] if i < len(na) else 0
+        if d > 0:
+            result += GW[d >> 1]
+        if d < 0:
+            result -= GW[-d >> 1]
+        d = nb[i] if i < len(nb) else 0
+        if d > 0:
+            result += qw[d >> 1]
+        if d < 0:
+            result -= qw[-d >> 1]
+    return result.affine()
+
+
+def msm(k: typing.List[Fr], pt: typing.List[Pt]) -> Pt:
+    # Multi-scalar multiplication sum(k[i] * pt[i]) using the bucket method (Pippenger). The scalars are cut into
+    # c-bit windows. In each window every point is added to the bucket of its digit, and the buckets are then summed
+    # with a running sum, so the cost per window is about len(pt) + 2^(c+1) additions instead of len(pt) doublings.
+    assert len(k) == len(pt)
+    q = [PtExt.affine_decode(e) for e in pt]
+    c = max(1, len(q).bit_length() - 3)
+    m = (1 << c) - 1
+    result = PtExt.nil()
+    for w in range((N.bit_length() + c - 1) // c - 1, -1, -1):
+        for _ in range(c):
+            result = result.double()
+        bucket: typing.List[PtExt | None] = [None] * (m + 1)
+        for i, e in enumerate(k):
+            d = (e.x >> (w * c)) & m
+            if d == 0:
+                continue
+            bucket[d] = q[i] if bucket[d] is None else bucket[d] + q[i]
+        accu = PtExt.nil()
+        part = PtExt.nil()
+        for d in range(m, 0, -1):
+            if bucket[d] is not None:
+                accu += bucket[d]
+            part += accu
+        result += part
+    return result.affine()
+
+
 if __name__ == '__main__':
     p = G * Fr(42)
     q = G * Fr(24)
@@ -161,3 +368,8 @@ if __name__ == '__main__':
     assert p + r == I
     assert p + I == p
     assert p * Fr(42) == G * Fr(1764)
+    assert gmul(Fr(42)) == p
+    assert gmul(-Fr(42)) == -p
+    assert dmul(Fr(42), Fr(2), q) == G * Fr(90)
+    assert dmul(Fr(42), -Fr(1), p) == I
+    assert msm([Fr(42), Fr(2), Fr(3)], [G, q, p]) == G * Fr(216)
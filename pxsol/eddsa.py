@@ -1,12 +1,19 @@
 import hashlib
 import pxsol.ed25519
+import secrets
+import typing
 
 # Edwards-Curve Digital Signature Algorithm (EdDSA)
 # See https://datatracker.ietf.org/doc/html/rfc8032#ref-CURVE25519
 
 
-def hash(data: bytearray) -> bytearray:
-    return bytearray(hashlib.sha512(data).digest())
+def hash(*data: bytearray) -> bytearray:
+    # Sha512 of the concatenation of all arguments. They are fed to the hasher one by one, so large messages are never
+    # copied.
+    h = hashlib.sha512()
+    for e in data:
+        h.update(e)
+    return bytearray(h.digest())
 
 
 def pt_encode(pt: pxsol.ed25519.Pt) -> bytearray:
@@ -32,70 +39,82 @@ def pt_decode(pt: bytearray) -> pxsol.ed25519.Pt:
     assert yint < pxsol.ed25519.P
     # To recover the x-coordinate, the curve equation implies x^2 = (y^2 - 1) / (d y^2 + 1) (mod p). The denominator is
     # always non-zero mod p.
-    y = pxsol.ed25519.Fq(yint)
-    x_x = (y * y - pxsol.ed25519.Fq(1)) / (pxsol.ed25519.D * y * y + pxsol.ed25519.Fq(1))
-    # To compute the square root of (u/v), the first step is to compute the candidate root x = (u/v)^((p+3)/8).
-    x = x_x ** ((pxsol.ed25519.P + 3) // 8)
+    p = pxsol.ed25519.P
+    yy = yint * yint % p
+    u = yy - 1
+    v = pxsol.ed25519.D.x * yy + 1
+    # To compute the square root of (u/v), the first step is to compute the candidate root x = (u/v)^((p+3)/8). This
+    # can be done with the following trick, to use a single modular powering for both the inversion and the square
+    # root: x = u v^3 (u v^7)^((p-5)/8) (mod p).
+    v3 = v * v % p * v % p
+    x = u * v3 * pow(u * v3 * v3 * v % p, (p - 5) // 8, p) % p
     # Again, there are three cases:
     # 1. If v x^2 = u (mod p), x is a square root.
     # 2. If v x^2 = -u (mod p), set x <-- x * 2^((p-1)/4), which is a square root.
     # 3. Otherwise, no square root exists for modulo p, and decoding fails.
-    if x*x != x_x:
-        x = x * pxsol.ed25519.Fq(2) ** ((pxsol.ed25519.P - 1) // 4)
-        assert x*x == x_x
+    vxx = v * x * x % p
+    if vxx != u % p:
+        assert vxx == -u % p
+        x = x * pxsol.ed25519.SQRT_M1 % p
     # Finally, use the x_0 bit to select the right square root. If x = 0, and x_0 = 1, decoding fails. Otherwise, if
     # x_0 != x mod 2, set x <-- p - x.  Return the decoded point (x,y).
-    if x == pxsol.ed25519.Fq(0):
+    if x == 0:
         assert not sign
-    if x.x & 1 != sign:
-        x = -x
-    return pxsol.ed25519.Pt(x, y)
+    if x & 1 != sign:
+        x = p - x
+    return pxsol.ed25519.Pt(pxsol.ed25519.Fq(x), pxsol.ed25519.Fq(yint))
 
 
 def pt_exists(pt: bytearray) -> bool:
-    # Tests whether a point is on ed25519 curve.
+    # Tests whether a point is on ed25519 curve. It is the same as pt_decode without computing x: a square root of
+    # u/v exists if and only if u * v is a quadratic residue, which is answered by a single exponentiation (euler's
+    # criterion) on plain integers.
+    p = pxsol.ed25519.P
     uint = int.from_bytes(pt, 'little')
     sign = uint >> 255
     yint = uint & ((1 << 255) - 1)
-    if yint >= pxsol.ed25519.P:
+    if yint >= p:
         return False
-    y = pxsol.ed25519.Fq(yint)
-    x_x = (y * y - pxsol.ed25519.Fq(1)) / (pxsol.ed25519.D * y * y + pxsol.ed25519.Fq(1))
-    x = x_x ** ((pxsol.ed25519.P + 3) // 8)
-    if x*x != x_x:
-        x = x * pxsol.ed25519.Fq(2) ** ((pxsol.ed25519.P - 1) // 4)
-    if x*x != x_x:
-        return False
-    if x == pxsol.ed25519.Fq(0) and sign:
-        return False
-    return True
+    yy = yint * yint % p
+    u = (yy - 1) % p
+    v = pxsol.ed25519.D.x * yy + 1
+    if u == 0:
+        return not sign
+    return pow(u * v % p, (p - 1) // 2, p) == 1
 
 
-def pubkey(prikey: bytearray) -> bytearray:
+def expand(prikey: bytearray) -> typing.Tuple[pxsol.ed25519.Fr, bytearray, bytearray]:
+    # Expand the private key into the secret scalar, the prefix used to derive the nonce and the encoded public key.
+    # The result only depends on the private key, callers signing many messages may cache it and use sign_expand.
+    # See https://datatracker.ietf.org/doc/html/rfc8032#section-5.1.5
     assert len(prikey) == 32
     h = hash(prikey)
     a = int.from_bytes(h[:32], 'little')
     a &= (1 << 254) - 8
     a |= (1 << 254)
     a = pxsol.ed25519.Fr(a)
-    return pt_encode(pxsol.ed25519.G * a)
+    prefix = h[32:]
+    A = pt_encode(pxsol.ed25519.gmul(a))
+    return a, prefix, A
+
+
+def pubkey(prikey: bytearray) -> bytearray:
+    return expand(prikey)[2]
 
 
 def sign(prikey: bytearray, m: bytearray) -> bytearray:
     # The inputs to the signing procedure is the private key, a 32-octet string, and a message M of arbitrary size.
     # See https://datatracker.ietf.org/doc/html/rfc8032#section-5.1.6
-    assert len(prikey) == 32
-    h = hash(prikey)
-    a = int.from_bytes(h[:32], 'little')
-    a &= (1 << 254) - 8
-    a |= (1 << 254)
-    a = pxsol.ed25519.Fr(a)
-    prefix = h[32:]
-    A = pt_encode(pxsol.ed25519.G * a)
-    r = pxsol.ed25519.Fr(int.from_bytes(hash(prefix + m), 'little'))
-    R = pxsol.ed25519.G * r
+    return sign_expand(expand(prikey), m)
+
+
+def sign_expand(e: typing.Tuple[pxsol.ed25519.Fr, bytearray, bytearray], m: bytearray) -> bytearray:
+    # Sign a message with an expanded private key, costs one scalar multiplication.
+    a, prefix, A = e
+    r = pxsol.ed25519.Fr(int.from_bytes(hash(prefix, m), 'little'))
+    R = pxsol.ed25519.gmul(r)
     Rs = pt_encode(R)
-    h = pxsol.ed25519.Fr(int.from_bytes(hash(Rs + A + m), 'little'))
+    h = pxsol.ed25519.Fr(int.from_bytes(hash(Rs, A, m), 'little'))
     s = r + h * a
     return Rs + bytearray(s.x.to_bytes(32, 'little'))
 
@@ -109,7 +128,64 @@ def verify(pubkey: bytearray, m: bytearray, sig: bytearray) -> bool:
     Rs = sig[:32]
     R = pt_decode(Rs)
     s = pxsol.ed25519.Fr(int.from_bytes(sig[32:], 'little'))
-    h = pxsol.ed25519.Fr(int.from_bytes(hash(Rs + pubkey + m), 'little'))
-    sB = pxsol.ed25519.G * s
-    hA = A * h
-    return sB == R + hA
+    h = pxsol.ed25519.Fr(int.from_bytes(hash(Rs, pubkey, m), 'little'))
+    # The check sB = R + hA is rewritten as sB - hA = R, so that both multiplications are done in a single pass. This
+    # is the cofactorless equation, the one solana checks, so a small order component in A or R makes it fail.
+    return pxsol.ed25519.dmul(s, -h, A) == R
+
+
+def verify_batch(data: typing.List[typing.Tuple[bytearray, bytearray, bytearray]]) -> typing.List[bool]:
+    # Verify many (pubkey, message, signature) items at once. Each item i gets a random 128-bit scalar z[i], and the
+    # combination sum(z[i] * (R[i] + h[i] * A[i] - s[i] * B)) is checked to be the identity with one multi-scalar
+    # multiplication. The batch equation is cofactored, it is multiplied by 8 and so ignores small order components of
+    # A and R, which verify rejects. A passing batch is therefore only reported once these components are ruled out,
+    # and every item is verified on its own if the batch fails, if they are found, or if the batch is too small to pay
+    # for ruling them out.
+    if len(data) < 256:
+        return [verify_catch(*e) for e in data]
+    k = [pxsol.ed25519.Fr(0)]
+    p = [pxsol.ed25519.G]
+    u = []
+    try:
+        for pubkey, m, sig in data:
+            assert len(pubkey) == 32
+            assert len(sig) == 64
+            A = pt_decode(pubkey)
+            Rs = sig[:32]
+            R = pt_decode(Rs)
+            s = pxsol.ed25519.Fr(int.from_bytes(sig[32:], 'little'))
+            h = pxsol.ed25519.Fr(int.from_bytes(hash(Rs, pubkey, m), 'little'))
+            z = pxsol.ed25519.Fr(secrets.randbits(128))
+            k[0] -= z * s
+            k.append(z)
+            p.append(R)
+            k.append(z * h)
+            p.append(A)
+            u.append(pxsol.ed25519.PtExt.affine_decode(R) + pxsol.ed25519.PtExt.affine_decode(A) * (h.x % 8))
+    except AssertionError:
+        return [verify_catch(*e) for e in data]
+    if pxsol.ed25519.msm(k, p) * pxsol.ed25519.Fr(8) != pxsol.ed25519.I:
+        return [verify_catch(*e) for e in data]
+    # The batch passing means 8 * (s[i] * B - h[i] * A[i] - R[i]) = 0, so verify can only disagree on an item whose
+    # residual is a non-zero small order point. Its small order part is the one of u[i] = R[i] + (h[i] mod 8) * A[i].
+    # Random subset sums of u are multiplied by the group order, which leaves their small order part only. Each sum
+    # misses a non-zero part with probability at most 1/2, 64 rounds bound this at 2^-64.
+    nil = pxsol.ed25519.PtExt.nil()
+    for _ in range(64):
+        r = nil
+        b = secrets.randbits(len(u))
+        for q in u:
+            if b & 1:
+                r += q
+            b >>= 1
+        if r * pxsol.ed25519.N != nil:
+            return [verify_catch(*e) for e in data]
+    return [True for _ in data]
+
+
+def verify_catch(pubkey: bytearray, m: bytearray, sig: bytearray) -> bool:
+    # Same as verify, but returns false instead of raising an error for malformed public keys or signatures.
+    try:
+        return verify(pubkey, m, sig)
+    except AssertionError:
+        return False
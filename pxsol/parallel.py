@@ -0,0 +1,34 @@
+import collections
+import concurrent.futures
+import itertools
+import os
+import typing
+
+# Helpers to spread pure python work across cpu cores.
+
+
+def apply(func: typing.Callable, data: typing.List) -> typing.List:
+    return [func(e) for e in data]
+
+
+def imap(func: typing.Callable, data: typing.Iterable, workers: int | None, chunk: int) -> typing.Iterator:
+    # Apply func to every item of data on a pool of worker processes and yield the results in input order. The input
+    # is consumed lazily in chunks and at most two chunks per worker are in flight, so arbitrarily long inputs can be
+    # streamed with bounded memory. The func and the items must be picklable. Workers defaults to the number of cpus,
+    # a single worker runs in the current process.
+    workers = workers or os.cpu_count()
+    if workers <= 1:
+        yield from map(func, data)
+        return
+    data = iter(data)
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        pend = collections.deque()
+        for _ in itertools.repeat(0):
+            while len(pend) < workers * 2:
+                part = list(itertools.islice(data, chunk))
+                if not part:
+                    break
+                pend.append(pool.submit(apply, func, part))
+            if not pend:
+                break
+            yield from pend.popleft().result()
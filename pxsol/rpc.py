@@ -1,27 +1,196 @@
 import base64
+import concurrent.futures
 import itertools
+import pxsol.base58
 import pxsol.config
+import pxsol.core
+import pxsol.log
 import random
 import requests
+import requests.adapters
+import threading
 import time
 import typing
 
 # Doc: https://solana.com/docs/rpc/http
 
 
+class Transport:
+    # A thread-safe http transport keeping a pool of keep-alive connections, so that consecutive calls reuse the same
+    # tcp and tls connection. Requests sessions are not documented as thread-safe, so each thread gets its own session,
+    # but all of them share one connection pool of the given size. Threads beyond the pool size wait for a free
+    # connection. Http pipelining is not supported by the underlying urllib3, use pxsol.rpc.batch to send several
+    # calls in one round trip instead.
+
+    def __init__(self, pool: int, timeout: float) -> None:
+        self.adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool, pool_block=True)
+        self.local = threading.local()
+        self.timeout = timeout
+
+    def close(self) -> None:
+        self.adapter.close()
+
+    def post(self, url: str, data: typing.Any) -> typing.Any:
+        # Post the json data, returns the decoded json response.
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+            self.local.session.mount('http://', self.adapter)
+            self.local.session.mount('https://', self.adapter)
+        return self.local.session.post(url, json=data, timeout=self.timeout).json()
+
+
+transport_lock = threading.Lock()
+
+
+def transport() -> Transport:
+    # Get the transport of the current config, created on first use.
+    conf = pxsol.config.current
+    if conf.get('transport') is None:
+        with transport_lock:
+            if conf.get('transport') is None:
+                conf.transport = Transport(conf.get('pool', 8), conf.get('timeout', 60))
+    return conf.transport
+
+
 def call(method: str, params: typing.List) -> typing.Any:
     # Send a json rpc request.
-    r = requests.post(pxsol.config.current.url, json={
+    r = transport().post(pxsol.config.current.url, {
         'id': random.randint(0x00000000, 0xffffffff),
         'jsonrpc': '2.0',
         'method': method,
         'params': params,
-    }).json()
+    })
     if 'error' in r:
         raise Exception(r['error'])
     return r['result']
 
 
+def batch(data: typing.List[typing.Tuple[str, typing.List]], catch: bool = False) -> typing.List[typing.Any]:
+    # Send many json rpc calls in one http request, returns their results in order. Calls beyond the batch size of
+    # the current config are split into several requests. A failed call raises an exception, or, if catch is set, its
+    # exception is returned in place of the result.
+    r = []
+    size = pxsol.config.current.get('batch', 100)
+    for i in range(0, len(data), size):
+        part = data[i:i + size]
+        r.extend(batch_result(part, transport().post(pxsol.config.current.url, batch_request(part)), catch))
+    return r
+
+
+def batch_request(part: typing.List[typing.Tuple[str, typing.List]]) -> typing.List[typing.Dict]:
+    # The body of a batch request, calls are identified by their position.
+    return [{
+        'id': j,
+        'jsonrpc': '2.0',
+        'method': method,
+        'params': params,
+    } for j, (method, params) in enumerate(part)]
+
+
+def batch_result(part: typing.List[typing.Tuple[str, typing.List]], resp: typing.Any, catch: bool) -> typing.List:
+    # Match the response of a batch request to its calls, see batch.
+    if not isinstance(resp, list):
+        raise Exception(resp['error'])
+    r = []
+    # Responses may come in any order, they are matched to the calls by id.
+    find = {e['id']: e for e in resp}
+    for j in range(len(part)):
+        e = find.get(j, {'error': {'code': -32603, 'message': 'missing response'}})
+        if 'error' not in e:
+            r.append(e['result'])
+        elif catch:
+            r.append(Exception(e['error']))
+        else:
+            raise Exception(e['error'])
+    return r
+
+
+def chunk(func: typing.Callable[[typing.List], typing.List], data: typing.List, size: int) -> typing.List:
+    # Split the data into chunks of at most size items and call func on each of them, at most pool of the current
+    # config at once. Returns the results of all chunks concatenated, in input order.
+    if len(data) <= size:
+        return func(data)
+    part = [data[i:i + size] for i in range(0, len(data), size)]
+    with concurrent.futures.ThreadPoolExecutor(min(len(part), pxsol.config.current.get('pool', 8))) as pool:
+        return list(itertools.chain.from_iterable(pool.map(func, part)))
+
+
+class Blockhash:
+    # A blockhash provider, it fetches the latest blockhash on every call.
+
+    def get(self) -> bytearray:
+        # Returns the blockhash to sign the next transaction with.
+        return pxsol.base58.decode(get_latest_blockhash({})['blockhash'])
+
+    def renew(self, blockhash: bytearray) -> bytearray:
+        # Returns a blockhash other than the given one, waiting for the cluster to produce a new one if needed.
+        for _ in itertools.repeat(0):
+            r = pxsol.base58.decode(get_latest_blockhash({})['blockhash'])
+            if r != blockhash:
+                return r
+            time.sleep(0.2)
+
+
+class BlockhashCache(Blockhash):
+    # A blockhash provider serving a cached blockhash, which a daemon thread refreshes every interval seconds. A
+    # blockhash is accepted by the cluster for 150 blocks, about 60 seconds, so a cached one older than age seconds is
+    # no longer served and is fetched again before use. Note that two identical transactions signed with the same
+    # blockhash are the same transaction, the cluster processes only one of them.
+
+    def __init__(self, interval: float = 2, age: float = 30) -> None:
+        self.age = age
+        self.done = threading.Event()
+        self.interval = interval
+        self.lock = threading.Lock()
+        # Tuple of fetch time, blockhash and last valid block height. It is replaced as a whole, readers need no lock.
+        # The blockhash is immutable, callers get their own copy.
+        self.latest = (-age, bytes(32), 0)
+        self.thread = None
+
+    def close(self) -> None:
+        # Stop the refresh thread.
+        self.done.set()
+        if self.thread:
+            self.thread.join()
+
+    def get(self) -> bytearray:
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self.loop, daemon=True)
+                    self.thread.start()
+        latest = self.latest
+        if time.monotonic() - latest[0] >= self.age:
+            latest = self.update()
+        return bytearray(latest[1])
+
+    def last_valid_block_height(self) -> int:
+        # Returns the last block height at which the served blockhash is still valid.
+        return self.latest[2]
+
+    def loop(self) -> None:
+        while not self.done.wait(self.interval):
+            try:
+                self.update()
+            except Exception as e:
+                pxsol.log.debugln(f'pxsol: blockhash update error={e}')
+
+    def renew(self, blockhash: bytearray) -> bytearray:
+        # Returns a blockhash other than the given one and puts it into the cache.
+        for _ in itertools.repeat(0):
+            r = self.update()[1]
+            if r != blockhash:
+                return bytearray(r)
+            time.sleep(0.2)
+
+    def update(self) -> typing.Tuple[float, bytes, int]:
+        # Fetch the latest blockhash and put it into the cache.
+        now = time.monotonic()
+        r = get_latest_blockhash({})
+        self.latest = (now, bytes(pxsol.base58.decode(r['blockhash'])), r['lastValidBlockHeight'])
+        return self.latest
+
+
 def wait(sigs: typing.List[str]) -> None:
     # Wait for all signatures in the parameter to be confirmed. There is no limit on the number of signatures.
     remain = sigs.copy()
@@ -30,6 +199,8 @@ def wait(sigs: typing.List[str]) -> None:
         if len(remain) == 0:
             break
         time.sleep(0.5)
+        # Only the oldest 256 signatures are polled on each tick, a single call, so that waiting on a large list
+        # doesn't flood the node with requests.
         oldest = remain[:256]
         newest = remain[256:]
         result = get_signature_statuses(oldest, {})
@@ -176,8 +347,11 @@ def get_minimum_balance_for_rent_exemption(data_size: int, conf: typing.Dict) ->
 
 
 def get_multiple_accounts(pubkey_list: typing.List[str], conf: typing.Dict) -> typing.List[typing.Dict]:
+    # The node accepts at most 100 keys per call, larger inputs are split and sent concurrently. The result keeps the
+    # shape of a single call: the context of the first chunk, and the values of all chunks in input order.
     conf.setdefault('commitment', pxsol.config.current.commitment)
-    return call('getMultipleAccounts', [pubkey_list, conf])
+    part = chunk(lambda e: [call('getMultipleAccounts', [e, conf])], pubkey_list, 100)
+    return {'context': part[0]['context'], 'value': list(itertools.chain.from_iterable(e['value'] for e in part))}
 
 
 def get_program_accounts(pubkey: str, conf: typing.Dict) -> typing.List[typing.Dict]:
@@ -193,9 +367,10 @@ def get_recent_prioritization_fees(pubkey_list: typing.List[str]) -> typing.List
     return call('getRecentPrioritizationFees', [pubkey_list])
 
 
-def get_signature_statuses(sigs: typing.List[str], conf: typing.Dict) -> typing.Dict:
+def get_signature_statuses(sigs: typing.List[str], conf: typing.Dict) -> typing.List[typing.Dict]:
+    # The node accepts at most 256 signatures per call, larger inputs are split and sent concurrently.
     conf.setdefault('searchTransactionHistory', True)
-    return call('getSignatureStatuses', [sigs, conf])['value']
+    return chunk(lambda e: call('getSignatureStatuses', [e, conf])['value'], sigs, 256)
 
 
 def get_signatures_for_address(pubkey: str, conf: typing.Dict) -> typing.List[typing.Dict]:
@@ -288,12 +463,21 @@ def request_airdrop(pubkey: str, value: int, conf: typing.Dict) -> str:
 def send_transaction(tx: str, conf: typing.Dict) -> str:
     conf.setdefault('encoding', 'base64')
     conf.setdefault('preflightCommitment', pxsol.config.current.commitment)
-    txid = pxsol.core.Transaction.serialize_decode(base64.b64decode(tx)).signatures[0]
-    txid = pxsol.base58.encode(txid)
-    pxsol.log.debugln(f'pxsol: transaction send signature={txid}')
+    send_transaction_log(tx)
     return call('sendTransaction', [tx, conf])
 
 
+def send_transaction_log(tx: str) -> None:
+    # Log the signature of a base64 encoded transaction about to be sent.
+    if pxsol.config.current.log:
+        # Only the first signature is needed. The first 96 base64 characters hold the signature count, at most 3 bytes,
+        # followed by the first signature.
+        data = memoryview(base64.b64decode(tx[:96]))
+        _, offset = pxsol.core.compact_u16_decode_view(data, 0)
+        txid = pxsol.base58.encode(data[offset:offset + 64])
+        pxsol.log.debugln(f'pxsol: transaction send signature={txid}')
+
+
 def simulate_transaction(tx: str, conf: typing.Dict) -> typing.Dict:
     conf.setdefault('commitment', pxsol.config.current.commitment)
     conf.setdefault('encoding', 'base64')
@@ -0,0 +1,467 @@
+import asyncio
+import itertools
+import json
+import pxsol.config
+import pxsol.log
+import pxsol.rpc
+import random
+import ssl
+import typing
+import urllib.parse
+
+# The asyncio version of pxsol.rpc. Every function of pxsol.rpc is mirrored here as a coroutine with the same
+# arguments, on an http/1.1 keep-alive client built on the standard library.
+#
+# Doc: https://solana.com/docs/rpc/http
+
+
+class Transport:
+    # An asyncio http transport keeping a pool of keep-alive connections. At most pool requests are on the wire at
+    # once, each on its own connection, and any number of further requests wait for a free connection. Http
+    # pipelining is not used, use pxsol.rpc_async.batch to send several calls in one round trip.
+    #
+    # Asyncio streams belong to the event loop they were opened in, so the pool is reset when used from a new loop.
+
+    def __init__(self, pool: int, timeout: float) -> None:
+        self.pool = pool
+        self.timeout = timeout
+        self.loop = None
+        self.idle: typing.Dict[typing.Tuple[str, int, bool], typing.List[typing.Tuple]] = {}
+        self.semaphore = None
+        self.ssl = ssl.create_default_context()
+
+    async def close(self) -> None:
+        for conns in self.idle.values():
+            for _, w in conns:
+                w.close()
+        self.idle = {}
+
+    async def connect(
+        self,
+        host: str,
+        port: int,
+        tls: bool,
+    ) -> typing.Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        conns = self.idle.get((host, port, tls))
+        if conns:
+            return conns.pop()
+        return await asyncio.open_connection(host, port, ssl=self.ssl if tls else None)
+
+    async def exchange(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        head: bytes,
+        body: bytes,
+    ) -> typing.Tuple[bytes, bool]:
+        # Send one request, returns the response body and whether the connection can be reused.
+        writer.write(head + body)
+        await writer.drain()
+        line = await reader.readline()
+        if not line:
+            raise ConnectionResetError
+        status = line.split(b' ', 2)
+        header: typing.Dict[str, str] = {}
+        for _ in itertools.repeat(0):
+            line = await reader.readline()
+            if line in [b'\r\n', b'\n', b'']:
+                break
+            k, v = line.decode('latin-1').split(':', 1)
+            header[k.strip().lower()] = v.strip()
+        if header.get('transfer-encoding', '').lower() == 'chunked':
+            data = bytearray()
+            for _ in itertools.repeat(0):
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    # Skip the trailer.
+                    while (await reader.readline()) not in [b'\r\n', b'\n', b'']:
+                        pass
+                    break
+                data.extend(await reader.readexactly(size))
+                await reader.readexactly(2)
+            data = bytes(data)
+        elif 'content-length' in header:
+            data = await reader.readexactly(int(header['content-length']))
+        else:
+            data = await reader.read()
+            header['connection'] = 'close'
+        keep = status[0] == b'HTTP/1.1' and header.get('connection', '').lower() != 'close'
+        return data, keep
+
+    async def post(self, url: str, data: typing.Any) -> typing.Any:
+        # Post the json data, returns the decoded json response.
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.idle = {}
+            self.semaphore = asyncio.Semaphore(self.pool)
+        u = urllib.parse.urlsplit(url)
+        tls = u.scheme == 'https'
+        host = u.hostname
+        port = u.port or (443 if tls else 80)
+        body = json.dumps(data).encode()
+        head = ''.join([
+            f'POST {u.path or "/"}{"?" + u.query if u.query else ""} HTTP/1.1\r\n',
+            f'Host: {u.netloc}\r\n',
+            'Content-Type: application/json\r\n',
+            f'Content-Length: {len(body)}\r\n',
+            'Connection: keep-alive\r\n',
+            '\r\n',
+        ]).encode()
+        async with self.semaphore:
+            # A pooled connection may have been closed by the server while idle, the request is then retried once on
+            # a new connection.
+            for retry in range(2):
+                reused = bool(self.idle.get((host, port, tls)))
+                reader, writer = await asyncio.wait_for(self.connect(host, port, tls), self.timeout)
+                try:
+                    resp, keep = await asyncio.wait_for(self.exchange(reader, writer, head, body), self.timeout)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    writer.close()
+                    if reused and retry == 0:
+                        continue
+                    raise
+                except BaseException:
+                    writer.close()
+                    raise
+                if keep:
+                    self.idle.setdefault((host, port, tls), []).append((reader, writer))
+                else:
+                    writer.close()
+                return json.loads(resp)
+
+
+def transport() -> Transport:
+    # Get the async transport of the current config, created on first use.
+    conf = pxsol.config.current
+    if conf.get('transport_async') is None:
+        conf.transport_async = Transport(conf.get('pool', 8), conf.get('timeout', 60))
+    return conf.transport_async
+
+
+async def call(method: str, params: typing.List) -> typing.Any:
+    # Send a json rpc request.
+    r = await transport().post(pxsol.config.current.url, {
+        'id': random.randint(0x00000000, 0xffffffff),
+        'jsonrpc': '2.0',
+        'method': method,
+        'params': params,
+    })
+    if 'error' in r:
+        raise Exception(r['error'])
+    return r['result']
+
+
+async def batch(data: typing.List[typing.Tuple[str, typing.List]], catch: bool = False) -> typing.List[typing.Any]:
+    # Send many json rpc calls in batch requests, returns their results in order. See pxsol.rpc.batch. The requests of
+    # a split batch are sent concurrently.
+    size = pxsol.config.current.get('batch', 100)
+    part = [data[i:i + size] for i in range(0, len(data), size)]
+    resp = await asyncio.gather(*[transport().post(pxsol.config.current.url, pxsol.rpc.batch_request(e)) for e in part])
+    r = []
+    for p, q in zip(part, resp):
+        r.extend(pxsol.rpc.batch_result(p, q, catch))
+    return r
+
+
+async def value(method: str, params: typing.List) -> typing.Any:
+    # Call the method and return the value field of its result.
+    return (await call(method, params))['value']
+
+
+async def chunk(
+    func: typing.Callable[[typing.List], typing.Awaitable[typing.List]],
+    data: typing.List,
+    size: int,
+) -> typing.List:
+    # Split the data into chunks of at most size items and await func on each of them concurrently, bounded by the
+    # pool of the transport. Returns the results of all chunks concatenated, in input order.
+    if len(data) <= size:
+        return await func(data)
+    part = await asyncio.gather(*[func(data[i:i + size]) for i in range(0, len(data), size)])
+    return list(itertools.chain.from_iterable(part))
+
+
+async def wait(sigs: typing.List[str]) -> None:
+    # Wait for all signatures in the parameter to be confirmed. There is no limit on the number of signatures.
+    remain = sigs.copy()
+    for _ in itertools.repeat(0):
+        pxsol.log.debugln(f'pxsol: transaction wait remain={len(remain)}')
+        if len(remain) == 0:
+            break
+        await asyncio.sleep(0.5)
+        # Only the oldest 256 signatures are polled on each tick, a single call, so that waiting on a large list
+        # doesn't flood the node with requests.
+        oldest = remain[:256]
+        newest = remain[256:]
+        result = await get_signature_statuses(oldest, {})
+        match pxsol.config.current.commitment:
+            case 'confirmed':
+                select = [e is None or e['confirmationStatus'] not in ['confirmed', 'finalized'] for e in result]
+            case 'finalized':
+                select = [e is None or e['confirmationStatus'] not in ['finalized'] for e in result]
+            case _:
+                select = [e is None or e['confirmationStatus'] not in ['finalized'] for e in result]
+        remain = list(itertools.compress(oldest, select)) + newest
+
+
+async def step() -> None:
+    # Waiting for at least one new block.
+    data = await get_block_height({})
+    for _ in itertools.repeat(0):
+        await asyncio.sleep(0.5)
+        if await get_block_height({}) != data:
+            break
+
+
+async def get_account_info(pubkey: str, conf: typing.Dict) -> typing.Dict:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return (await call('getAccountInfo', [pubkey, conf]))['value']
+
+
+async def get_balance(pubkey: str, conf: typing.Dict) -> int:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return (await call('getBalance', [pubkey, conf]))['value']
+
+
+async def get_block(slot_number: int, conf: typing.Dict) -> typing.Dict:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('getBlock', [slot_number, conf])
+
+
+async def get_block_commitment(block_number: int) -> typing.Dict:
+    return await call('getBlockCommitment', [block_number])
+
+
+async def get_block_height(conf: typing.Dict) -> int:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('getBlockHeight', [conf])
+
+
+async def get_block_production(conf: typing.Dict) -> typing.Dict:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('getBlockProduction', [conf])
+
+
+async def get_block_time(block_number: int) -> int:
+    return await call('getBlockTime', [block_number])
+
+
+async def get_blocks(start_slot: int, end_slot: int, conf: typing.Dict) -> typing.List[int]:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('getBlocks', [start_slot, end_slot, conf])
+
+
+async def get_blocks_with_limit(start_slot: int, limit: int, conf: typing.Dict) -> typing.List[int]:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('getBlocksWithLimit', [start_slot, limit, conf])
+
+
+async def get_cluster_nodes() -> typing.List[typing.Dict]:
+    return await call('getClusterNodes', [])
+
+
+async def get_epoch_info(conf: typing.Dict) -> typing.Dict:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('getEpochInfo', [conf])
+
+
+async def get_epoch_schedule() -> typing.Dict:
+    return await call('getEpochSchedule', [])
+
+
+async def get_fee_for_message(message: str, conf: typing.Dict) -> int:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('getFeeForMessage', [message, conf])
+
+
+async def get_first_available_block() -> int:
+    return await call('getFirstAvailableBlock', [])
+
+
+async def get_genesis_hash() -> str:
+    return await call('getGenesisHash', [])
+
+
+async def get_health() -> typing.Dict | str:
+    return await call('getHealth', [])
+
+
+async def get_highest_snapshot_slot() -> typing.Dict:
+    return await call('getHighestSnapshotSlot', [])
+
+
+async def get_identity() -> typing.Dict:
+    return await call('getIdentity', [])
+
+
+async def get_inflation_governor(conf: typing.Dict) -> typing.Dict:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('getInflationGovernor', [conf])
+
+
+async def get_inflation_rate() -> typing.Dict:
+    return await call('getInflationRate', [])
+
+
+async def get_inflation_reward(addr_list: typing.List[str], conf: typing.Dict) -> typing.Dict:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('getInflationReward', [addr_list, conf])
+
+
+async def get_largest_accounts(conf: typing.Dict) -> typing.List[typing.Dict]:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('getLargestAccounts', [conf])
+
+
+async def get_latest_blockhash(conf: typing.Dict) -> typing.Dict:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return (await call('getLatestBlockhash', [conf]))['value']
+
+
+async def get_leader_schedule(epoch: int, conf: typing.Dict) -> typing.Dict:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('getLeaderSchedule', [epoch, conf])
+
+
+async def get_max_retransmit_slot() -> int:
+    return await call('getMaxRetransmitSlot', [])
+
+
+async def get_max_shred_insert_slot() -> int:
+    return await call('getMaxShredInsertSlot', [])
+
+
+async def get_minimum_balance_for_rent_exemption(data_size: int, conf: typing.Dict) -> int:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('getMinimumBalanceForRentExemption', [data_size, conf])
+
+
+async def get_multiple_accounts(pubkey_list: typing.List[str], conf: typing.Dict) -> typing.List[typing.Dict]:
+    # The node accepts at most 100 keys per call, larger inputs are split and sent concurrently. The result keeps the
+    # shape of a single call: the context of the first chunk, and the values of all chunks in input order.
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+
+    async def single(e: typing.List[str]) -> typing.List[typing.Dict]:
+        return [await call('getMultipleAccounts', [e, conf])]
+    part = await chunk(single, pubkey_list, 100)
+    return {'context': part[0]['context'], 'value': list(itertools.chain.from_iterable(e['value'] for e in part))}
+
+
+async def get_program_accounts(pubkey: str, conf: typing.Dict) -> typing.List[typing.Dict]:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('getProgramAccounts', [pubkey, conf])
+
+
+async def get_recent_performance_samples(limit: int) -> typing.List[typing.Dict]:
+    return await call('getRecentPerformanceSamples', [limit])
+
+
+async def get_recent_prioritization_fees(pubkey_list: typing.List[str]) -> typing.List[typing.Dict]:
+    return await call('getRecentPrioritizationFees', [pubkey_list])
+
+
+async def get_signature_statuses(sigs: typing.List[str], conf: typing.Dict) -> typing.List[typing.Dict]:
+    # The node accepts at most 256 signatures per call, larger inputs are split and sent concurrently.
+    conf.setdefault('searchTransactionHistory', True)
+    return await chunk(lambda e: value('getSignatureStatuses', [e, conf]), sigs, 256)
+
+
+async def get_signatures_for_address(pubkey: str, conf: typing.Dict) -> typing.List[typing.Dict]:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('getSignaturesForAddress', [pubkey, conf])
+
+
+async def get_slot(conf: typing.Dict) -> int:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('getSlot', [conf])
+
+
+async def get_slot_leader(conf: typing.Dict) -> str:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('getSlotLeader', [conf])
+
+
+async def get_slot_leaders(start_slot: int, limit: int) -> typing.List[str]:
+    return await call('getSlotLeaders', [start_slot, limit])
+
+
+async def get_stake_minimum_delegation(conf: typing.Dict) -> typing.Dict:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('getStakeMinimumDelegation', [conf])
+
+
+async def get_supply(conf: typing.Dict) -> typing.Dict:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('getSupply', [conf])
+
+
+async def get_token_account_balance(pubkey: str, conf: typing.Dict) -> typing.Dict:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('getTokenAccountBalance', [pubkey, conf])
+
+
+async def get_token_accounts_by_delegate(pubkey: str, by: typing.Dict, conf: typing.Dict) -> typing.Dict:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('getTokenAccountsByDelegate', [pubkey, by, conf])
+
+
+async def get_token_accounts_by_owner(pubkey: str, by: typing.Dict, conf: typing.Dict) -> typing.Dict:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('getTokenAccountsByOwner', [pubkey, by, conf])
+
+
+async def get_token_largest_accounts(pubkey: str, conf: typing.Dict) -> typing.Dict:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('getTokenLargestAccounts', [pubkey, conf])
+
+
+async def get_token_supply(pubkey: str, conf: typing.Dict) -> typing.Dict:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('getTokenSupply', [pubkey, conf])
+
+
+async def get_transaction(signature: str, conf: typing.Dict) -> typing.Dict:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('getTransaction', [signature, conf])
+
+
+async def get_transaction_count(conf: typing.Dict) -> int:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('getTransactionCount', [conf])
+
+
+async def get_version() -> typing.Dict:
+    return await call('getVersion', [])
+
+
+async def get_vote_accounts(conf: typing.Dict) -> typing.Dict:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('getVoteAccounts', [conf])
+
+
+async def is_blockhash_valid(blockhash: str, conf: typing.Dict) -> bool:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('isBlockhashValid', [blockhash, conf])
+
+
+async def minimum_ledger_slot() -> int:
+    return await call('minimumLedgerSlot', [])
+
+
+async def request_airdrop(pubkey: str, value: int, conf: typing.Dict) -> str:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    return await call('requestAirdrop', [pubkey, value, conf])
+
+
+async def send_transaction(tx: str, conf: typing.Dict) -> str:
+    conf.setdefault('encoding', 'base64')
+    conf.setdefault('preflightCommitment', pxsol.config.current.commitment)
+    pxsol.rpc.send_transaction_log(tx)
+    return await call('sendTransaction', [tx, conf])
+
+
+async def simulate_transaction(tx: str, conf: typing.Dict) -> typing.Dict:
+    conf.setdefault('commitment', pxsol.config.current.commitment)
+    conf.setdefault('encoding', 'base64')
+    return await call('simulateTransaction', [tx, conf])
@@ -12,9 +12,17 @@ import typing
 class Wallet:
     # A built-in solana wallet that can be used to perform most on-chain operations.
 
-    def __init__(self, prikey: pxsol.core.PriKey) -> None:
+    def __init__(self, prikey: pxsol.core.PriKey, blockhash: pxsol.rpc.Blockhash | None = None) -> None:
+        # The blockhash provider signs transactions with a fresh blockhash by default. Pass a pxsol.rpc.BlockhashCache
+        # to save a round trip per transaction. With a cached blockhash, many transactions share the same blockhash,
+        # and two identical transactions signed with the same blockhash have the same signature: the cluster only
+        # processes the first one and rejects the second as already processed. Transfer handles this by signing a
+        # repeated transfer with a newer blockhash, other transactions sent by the wallet are not expected to repeat.
+        self.blockhash = blockhash if blockhash else pxsol.rpc.Blockhash()
         self.prikey = prikey
         self.pubkey = prikey.pubkey()
+        # The blockhash of the last transfer, and the signatures of the transfers sent with it.
+        self.transfer_sent: typing.Tuple[bytes, typing.Set[bytes]] = (bytes(32), set())
 
     def __repr__(self) -> str:
         return json.dumps(self.json())
@@ -25,10 +33,86 @@ class Wallet:
             'pubkey': self.pubkey.base58(),
         }
 
+    def address_lookup_table_create(self, addresses: typing.List[pxsol.core.PubKey]) -> pxsol.core.PubKey:
+        # Create an address lookup table owned by the wallet and fill it with the addresses. The table is put into
+        # pxsol.core.address_lookup_table_cache, so that transactions can be compiled against it without fetching it
+        # again. Note that addresses are only usable in the slot after the one they were added in.
+        recent_slot = pxsol.rpc.get_slot({})
+        table_pubkey, bump = pxsol.core.ProgramAddressLookupTable.derive(self.pubkey, recent_slot)
+        rq = pxsol.core.Requisition(pxsol.core.ProgramAddressLookupTable.pubkey, [], bytearray())
+        rq.account.append(pxsol.core.AccountMeta(table_pubkey, 1))
+        rq.account.append(pxsol.core.AccountMeta(self.pubkey, 2))
+        rq.account.append(pxsol.core.AccountMeta(self.pubkey, 3))
+        rq.account.append(pxsol.core.AccountMeta(pxsol.core.ProgramSystem.pubkey, 0))
+        rq.data = pxsol.core.ProgramAddressLookupTable.create_lookup_table(recent_slot, bump)
+        tx = pxsol.core.Transaction.requisition_decode(self.pubkey, [rq])
+        tx.message.recent_blockhash = self.blockhash.get()
+        tx.sign([self.prikey])
+        txid = pxsol.rpc.send_transaction(base64.b64encode(tx.serialize()).decode(), {})
+        pxsol.rpc.wait([txid])
+        # Up to 30 addresses fit in a transaction. Extensions are sent one by one, since they decide the index of each
+        # address in the table.
+        size = 30
+        for i in range(0, len(addresses), size):
+            rq = pxsol.core.Requisition(pxsol.core.ProgramAddressLookupTable.pubkey, [], bytearray())
+            rq.account.append(pxsol.core.AccountMeta(table_pubkey, 1))
+            rq.account.append(pxsol.core.AccountMeta(self.pubkey, 2))
+            rq.account.append(pxsol.core.AccountMeta(self.pubkey, 3))
+            rq.account.append(pxsol.core.AccountMeta(pxsol.core.ProgramSystem.pubkey, 0))
+            rq.data = pxsol.core.ProgramAddressLookupTable.extend_lookup_table(addresses[i:i+size])
+            tx = pxsol.core.Transaction.requisition_decode(self.pubkey, [rq])
+            tx.message.recent_blockhash = self.blockhash.get()
+            tx.sign([self.prikey])
+            data = tx.serialize()
+            assert len(data) <= 1232
+            txid = pxsol.rpc.send_transaction(base64.b64encode(data).decode(), {})
+            pxsol.rpc.wait([txid])
+        info = pxsol.rpc.get_account_info(table_pubkey.base58(), {'encoding': 'base64'})
+        table = pxsol.core.AddressLookupTable.serialize_decode(table_pubkey, base64.b64decode(info['data'][0]))
+        pxsol.core.address_lookup_table_cache.put(table)
+        return table_pubkey
+
     def balance(self) -> int:
         # Returns the lamport balance of the account.
         return pxsol.rpc.get_balance(self.pubkey.base58(), {})
 
+    def compute_budget(
+        self,
+        data: typing.List[pxsol.core.Requisition],
+        price: int,
+    ) -> typing.List[pxsol.core.Requisition]:
+        # Prepend compute budget instructions to the requisitions: a compute unit limit sized to what the transaction
+        # actually consumes, and a compute unit price in micro-lamports if the price is not zero. The consumption is
+        # simulated once per transaction shape and cached in pxsol.core.compute_unit_cache, see ComputeUnitCache. The
+        # requisitions must not contain compute budget instructions themselves, duplicates make a transaction invalid.
+        assert all(r.program != pxsol.core.ProgramComputeBudget.pubkey for r in data)
+        r = [pxsol.core.Requisition(pxsol.core.ProgramComputeBudget.pubkey, [], bytearray())]
+        r[0].data = pxsol.core.ProgramComputeBudget.set_compute_unit_limit(pxsol.core.ProgramComputeBudget.units_max)
+        if price:
+            r.append(pxsol.core.Requisition(pxsol.core.ProgramComputeBudget.pubkey, [], bytearray()))
+            r[1].data = pxsol.core.ProgramComputeBudget.set_compute_unit_price(price)
+        shape = pxsol.core.ComputeUnitCache.shape(data, bool(price))
+        units = pxsol.core.compute_unit_cache.get(shape)
+        if units is None:
+            # Simulate the exact instructions returned, the compute budget instructions consume compute units too.
+            tx = pxsol.core.Transaction.requisition_decode(self.pubkey, r + data)
+            tx.message.recent_blockhash = bytearray(32)
+            # Signatures are not verified and the blockhash is replaced, so the transaction doesn't need to be signed.
+            tx.signatures = [bytearray(64) for _ in range(tx.message.header.required_signatures)]
+            rt = pxsol.rpc.simulate_transaction(base64.b64encode(tx.serialize()).decode(), {
+                'replaceRecentBlockhash': True,
+                'sigVerify': False,
+            })
+            if rt['value']['err'] is not None:
+                raise Exception(rt['value']['err'])
+            units = rt['value']['unitsConsumed']
+            pxsol.core.compute_unit_cache.put(shape, units)
+        # Leave a margin of 10%, as the consumption may vary slightly with the accounts and data. The limit has the
+        # same size whatever its value, so it doesn't change the consumption.
+        r[0].data = pxsol.core.ProgramComputeBudget.set_compute_unit_limit(
+            min(units + units // 10, pxsol.core.ProgramComputeBudget.units_max))
+        return r + data
+
     def program_buffer_closed(self, program_buffer_pubkey: pxsol.core.PubKey) -> None:
         # Close a buffer account. This method is used to withdraw all lamports when the buffer account is no longer in
         # use due to unexpected errors.
@@ -38,7 +122,7 @@ class Wallet:
         rq.account.append(pxsol.core.AccountMeta(self.pubkey, 2))
         rq.data = pxsol.core.ProgramLoaderUpgradeable.close()
         tx = pxsol.core.Transaction.requisition_decode(self.pubkey, [rq])
-        tx.message.recent_blockhash = pxsol.base58.decode(pxsol.rpc.get_latest_blockhash({})['blockhash'])
+        tx.message.recent_blockhash = self.blockhash.get()
         tx.sign([self.prikey])
         txid = pxsol.rpc.send_transaction(base64.b64encode(tx.serialize()).decode(), {})
         pxsol.rpc.wait([txid])
@@ -65,7 +149,7 @@ class Wallet:
         r1.account.append(pxsol.core.AccountMeta(self.pubkey, 0))
         r1.data = pxsol.core.ProgramLoaderUpgradeable.initialize_buffer()
         tx = pxsol.core.Transaction.requisition_decode(self.pubkey, [r0, r1])
-        tx.message.recent_blockhash = pxsol.base58.decode(pxsol.rpc.get_latest_blockhash({})['blockhash'])
+        tx.message.recent_blockhash = self.blockhash.get()
         tx.sign([self.prikey, program_buffer_prikey])
         txid = pxsol.rpc.send_transaction(base64.b64encode(tx.serialize()).decode(), {})
         pxsol.rpc.wait([txid])
@@ -80,10 +164,11 @@ class Wallet:
             rq.account.append(pxsol.core.AccountMeta(self.pubkey, 2))
             rq.data = pxsol.core.ProgramLoaderUpgradeable.write(i, elem)
             tx = pxsol.core.Transaction.requisition_decode(self.pubkey, [rq])
-            tx.message.recent_blockhash = pxsol.base58.decode(pxsol.rpc.get_latest_blockhash({})['blockhash'])
+            tx.message.recent_blockhash = self.blockhash.get()
             tx.sign([self.prikey])
-            assert len(tx.serialize()) <= 1232
-            txid = pxsol.rpc.send_transaction(base64.b64encode(tx.serialize()).decode(), {})
+            data = tx.serialize()
+            assert len(data) <= 1232
+            txid = pxsol.rpc.send_transaction(base64.b64encode(data).decode(), {})
             hall.append(txid)
         pxsol.rpc.wait(hall)
         return program_buffer_pubkey
@@ -98,7 +183,7 @@ class Wallet:
         rq.account.append(pxsol.core.AccountMeta(program_pubkey, 1))
         rq.data = pxsol.core.ProgramLoaderUpgradeable.close()
         tx = pxsol.core.Transaction.requisition_decode(self.pubkey, [rq])
-        tx.message.recent_blockhash = pxsol.base58.decode(pxsol.rpc.get_latest_blockhash({})['blockhash'])
+        tx.message.recent_blockhash = self.blockhash.get()
         tx.sign([self.prikey])
         txid = pxsol.rpc.send_transaction(base64.b64encode(tx.serialize()).decode(), {})
         pxsol.rpc.wait([txid])
@@ -129,7 +214,7 @@ class Wallet:
         r1.account.append(pxsol.core.AccountMeta(self.pubkey, 2))
         r1.data = pxsol.core.ProgramLoaderUpgradeable.deploy_with_max_data_len(len(program) * 2)
         tx = pxsol.core.Transaction.requisition_decode(self.pubkey, [r0, r1])
-        tx.message.recent_blockhash = pxsol.base58.decode(pxsol.rpc.get_latest_blockhash({})['blockhash'])
+        tx.message.recent_blockhash = self.blockhash.get()
         tx.sign([self.prikey, program_prikey])
         txid = pxsol.rpc.send_transaction(base64.b64encode(tx.serialize()).decode(), {})
         pxsol.rpc.wait([txid])
@@ -149,7 +234,7 @@ class Wallet:
         rq.account.append(pxsol.core.AccountMeta(self.pubkey, 2))
         rq.data = pxsol.core.ProgramLoaderUpgradeable.upgrade()
         tx = pxsol.core.Transaction.requisition_decode(self.pubkey, [rq])
-        tx.message.recent_blockhash = pxsol.base58.decode(pxsol.rpc.get_latest_blockhash({})['blockhash'])
+        tx.message.recent_blockhash = self.blockhash.get()
         tx.sign([self.prikey])
         txid = pxsol.rpc.send_transaction(base64.b64encode(tx.serialize()).decode(), {})
         pxsol.rpc.wait([txid])
@@ -162,8 +247,17 @@ class Wallet:
         rq.account.append(pxsol.core.AccountMeta(pubkey, 1))
         rq.data = pxsol.core.ProgramSystem.transfer(value)
         tx = pxsol.core.Transaction.requisition_decode(self.pubkey, [rq])
-        tx.message.recent_blockhash = pxsol.base58.decode(pxsol.rpc.get_latest_blockhash({})['blockhash'])
+        tx.message.recent_blockhash = self.blockhash.get()
+        if tx.message.recent_blockhash != self.transfer_sent[0]:
+            self.transfer_sent = (bytes(tx.message.recent_blockhash), set())
         tx.sign([self.prikey])
+        if bytes(tx.signatures[0]) in self.transfer_sent[1]:
+            # The same transfer was already sent with this blockhash, it would be rejected as already processed.
+            tx.message.recent_blockhash = self.blockhash.renew(tx.message.recent_blockhash)
+            self.transfer_sent = (bytes(tx.message.recent_blockhash), set())
+            tx.signatures = []
+            tx.sign([self.prikey])
+        self.transfer_sent[1].add(bytes(tx.signatures[0]))
         txid = pxsol.rpc.send_transaction(base64.b64encode(tx.serialize()).decode(), {})
         assert pxsol.base58.decode(txid) == tx.signatures[0]
         pxsol.rpc.wait([txid])
@@ -0,0 +1,31 @@
+import http.server
+import pxsol
+import pytest
+import threading
+
+
+@pytest.fixture
+def stand_in():
+    # Start a stand-in rpc server with the given request handler, and point the current config at it, with fresh
+    # transports and the given config overrides. The config is restored and the server shut down after the test.
+    current = pxsol.config.current
+    server = []
+
+    def start(handler: type, conf: dict) -> http.server.ThreadingHTTPServer:
+        s = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        s.daemon_threads = True
+        threading.Thread(target=s.serve_forever, daemon=True).start()
+        server.append(s)
+        pxsol.config.current = pxsol.config.ObjectDict(current | {
+            'transport': None,
+            'transport_async': None,
+            'url': f'http://127.0.0.1:{s.server_address[1]}',
+        } | conf)
+        return s
+
+    yield start
+    if pxsol.config.current.get('transport'):
+        pxsol.config.current.transport.close()
+    pxsol.config.current = current
+    for s in server:
+        s.shutdown()
@@ -0,0 +1,79 @@
+import pxsol
+import pytest
+import random
+
+B58_DIGITS = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+
+
+def encode_reference(b: bytearray) -> str:
+    # The one digit at a time codec, the new implementation is validated against it.
+    n = int.from_bytes(b)
+    res = []
+    while n > 0:
+        n, r = divmod(n, 58)
+        res.append(B58_DIGITS[r])
+    res = ''.join(res[::-1])
+    pad = 0
+    for c in b:
+        if c == 0:
+            pad += 1
+        else:
+            break
+    return B58_DIGITS[0] * pad + res
+
+
+def decode_reference(s: str) -> bytearray:
+    if not s:
+        return bytearray()
+    n = 0
+    for c in s:
+        n *= 58
+        assert c in B58_DIGITS
+        n += B58_DIGITS.index(c)
+    res = bytearray(n.to_bytes(max((n.bit_length() + 7) // 8, 1)))
+    pad = 0
+    for c in s[:-1]:
+        if c == B58_DIGITS[0]:
+            pad += 1
+        else:
+            break
+    return bytearray(pad) + res
+
+
+def test_base58():
+    assert pxsol.base58.encode(bytearray()) == ''
+    assert pxsol.base58.encode(bytearray(32)) == '11111111111111111111111111111111'
+    assert pxsol.base58.encode(bytearray(b'hello world')) == 'StV1DL6CwTryKyV'
+    assert pxsol.base58.decode('') == bytearray()
+    assert pxsol.base58.decode('1') == bytearray(1)
+    assert pxsol.base58.decode('11111111111111111111111111111111') == bytearray(32)
+    assert pxsol.base58.decode('StV1DL6CwTryKyV') == bytearray(b'hello world')
+
+
+def test_base58_invalid():
+    for s in ['0', 'O', 'I', 'l', '1111111111l', '+', 'é']:
+        with pytest.raises(AssertionError):
+            pxsol.base58.decode(s)
+
+
+def test_base58_random():
+    for size in [0, 1, 2, 9, 10, 11, 31, 32, 33, 63, 64, 65, 100]:
+        for _ in range(64):
+            data = bytearray(random.randbytes(size))
+            data[:random.randint(0, size)] = bytearray(random.randint(0, size))
+            data = data[:size]
+            s = encode_reference(data)
+            assert pxsol.base58.encode(data) == s
+            assert pxsol.base58.decode(s) == data
+            assert pxsol.base58.decode(s) == decode_reference(s)
+
+
+def test_base58_many():
+    data = [bytearray(random.randbytes(32)) for _ in range(8)]
+    data.extend(data[:4])
+    text = [pxsol.base58.encode(e) for e in data]
+    assert pxsol.base58.encode_many(data) == text
+    assert pxsol.base58.encode_many(data, 2) == text
+    assert pxsol.base58.decode_many(text) == data
+    assert pxsol.base58.decode_many(text, 2) == data
+    assert pxsol.core.PubKey.base58_decode_many(text) == [pxsol.core.PubKey(e) for e in data]
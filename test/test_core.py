@@ -1,4 +1,8 @@
+import copy
+import io
+import pickle
 import pxsol
+import pytest
 import random
 
 
@@ -35,6 +39,11 @@ def test_compact_u16_random():
     for _ in range(8):
         n = random.randint(0, 0xffff)
         assert pxsol.core.compact_u16_decode(pxsol.core.compact_u16_encode(n)) == n
+    for n in [0x00, 0x7f, 0x80, 0x3fff, 0x4000, 0xffff, random.randint(0, 0xffff)]:
+        data = bytearray([0xff])
+        pxsol.core.compact_u16_encode_into(data, n)
+        assert data[1:] == pxsol.core.compact_u16_encode(n)
+        assert pxsol.core.compact_u16_size(n) == len(data) - 1
 
 
 def test_prikey():
@@ -47,6 +56,37 @@ def test_prikey():
     assert prikey == pxsol.core.PriKey.int_decode(prikey.int())
     assert prikey.wif() == '1111111111111111111111111111111PPm2a2NNZH2EFJ5UkEjkH9Fcxn8cvjTmZDKQQisyLDmA'
     assert prikey == pxsol.core.PriKey.wif_decode(prikey.wif())
+    assert prikey.pubkey() is prikey.pubkey()
+
+
+def test_prikey_sign():
+    prikey = pxsol.core.PriKey.int_decode(1)
+    for _ in range(4):
+        msg = bytearray(random.randbytes(random.randint(0, 64)))
+        sig = prikey.sign(msg)
+        assert sig == pxsol.eddsa.sign(prikey.p, msg)
+        assert pxsol.eddsa.verify(prikey.pubkey().p, msg, sig)
+
+
+def test_pubkey():
+    pubkey = pxsol.core.PriKey.int_decode(1).pubkey()
+    assert pubkey.base58() == '6ASf5EcmmEHTgDJ4X4ZT5vT6iHVJBXPg5AN5YoTCpGWt'
+    assert pubkey == pxsol.core.PubKey.base58_decode(pubkey.base58())
+    assert pubkey == pxsol.core.PubKey.hex_decode(pubkey.hex())
+    assert pubkey == pxsol.core.PubKey.int_decode(pubkey.int())
+    assert pubkey == pickle.loads(pickle.dumps(pubkey))
+    assert {pubkey: 1}[pxsol.core.PubKey(bytearray(pubkey.p))] == 1
+    with pytest.raises(AttributeError):
+        pubkey.p = bytes(32)
+
+
+def test_pubkey_intern():
+    system = pxsol.core.PubKey.base58_decode('11111111111111111111111111111111')
+    assert system is pxsol.core.ProgramSystem.pubkey
+    pubkey = pxsol.core.PubKey(bytearray(random.randbytes(32)))
+    assert pxsol.core.PubKey.base58_decode(pubkey.base58()) is not pubkey
+    assert pxsol.core.PubKey.intern(pubkey) is pubkey
+    assert pxsol.core.PubKey.base58_decode(pubkey.base58()) is pubkey
 
 
 def test_pubkey_derive():
@@ -57,6 +97,52 @@ def test_pubkey_derive():
     assert pubkey.derive(seed).base58() == 'Eb6T9mLCxAE1FxAXbCGpB5TN3yMbgo9rsP8A8HWGwuXc'
 
 
+def test_pubkey_derive_many():
+    pubkey = pxsol.core.PubKey.base58_decode('BPFLoaderUpgradeab1e11111111111111111111111')
+    seeds = [bytearray(random.randbytes(32)) for _ in range(8)]
+    r = list(pxsol.core.derive_many(pubkey, seeds, 2))
+    # Results of the workers are put into the cache of this process.
+    for seed, pda in zip(seeds, r):
+        assert pxsol.core.program_address_cache.get((bytes(pubkey.p), (bytes(seed),)))[0] == pda.p
+    assert r == [pubkey.derive(e) for e in seeds]
+
+
+def test_pubkey_many():
+    prikeys = [pxsol.core.PriKey.int_decode(i) for i in range(1, 9)]
+    assert list(pxsol.core.pubkey_many(prikeys, 2)) == [e.pubkey() for e in prikeys]
+
+
+def test_pubkey_find_program_address(tmp_path):
+    pubkey = pxsol.core.PubKey.base58_decode('BPFLoaderUpgradeab1e11111111111111111111111')
+    seed = bytearray(int(0).to_bytes(32))
+    pda, bump = pubkey.find_program_address([seed])
+    assert pda.base58() == '5ReXsszTZPmCZuH7wHPoEkxqRq3Bb1xWWcim13zDH6LX'
+    assert pubkey.create_program_address([seed, bytearray([bump])]) == pda
+    assert pubkey.find_program_address([seed]) == (pda, bump)
+    assert pubkey.find_program_address([seed[:16], seed[16:]]) == (pda, bump)
+    cache = pxsol.core.program_address_cache
+    try:
+        pxsol.core.program_address_cache = pxsol.core.ProgramAddressCache(1, str(tmp_path / 'pda'))
+        pubkey.find_program_address([seed])
+        pubkey.find_program_address([bytearray(int(1).to_bytes(32))])
+        assert len(pxsol.core.program_address_cache.data) == 1
+        pxsol.core.program_address_cache = pxsol.core.ProgramAddressCache(2, str(tmp_path / 'pda'))
+        assert pxsol.core.program_address_cache.get((bytes(pubkey.p), (bytes(seed),))) == (pda.p, bump)
+        # The file is compacted once it holds twice the size of entries, and when it is loaded.
+        for i in range(16):
+            pubkey.find_program_address([bytearray(int(i).to_bytes(32))])
+        pxsol.core.program_address_cache.close()
+        assert len((tmp_path / 'pda').read_text().splitlines()) <= 4
+        with open(tmp_path / 'pda', 'a') as f:
+            f.write('["00", [')
+        pxsol.core.program_address_cache = pxsol.core.ProgramAddressCache(2, str(tmp_path / 'pda'))
+        pxsol.core.program_address_cache.close()
+        assert len((tmp_path / 'pda').read_text().splitlines()) == 2
+        assert pxsol.core.program_address_cache.get((bytes(pubkey.p), (bytes(int(15).to_bytes(32)),))) is not None
+    finally:
+        pxsol.core.program_address_cache = cache
+
+
 def test_transaction():
     data = bytearray([
         0x01, 0xc5, 0x2e, 0xfc, 0x4e, 0x7b, 0x7f, 0x9c, 0x10, 0x45, 0xd5, 0xc8, 0x2a, 0x87, 0xea, 0x69,
@@ -76,3 +162,288 @@ def test_transaction():
     ])
     tx = pxsol.core.Transaction.serialize_decode(data)
     assert tx.serialize() == data
+    assert tx.signatures[0] == data[1:65]
+    assert tx.message.account_keys[2] is pxsol.core.ProgramSystem.pubkey
+    assert tx.message.instructions[0].data == pxsol.core.ProgramSystem.transfer(pxsol.denomination.sol)
+    assert pxsol.core.Transaction.serialize_decode(bytearray(data)).json() == tx.json()
+    # Decoded fields are plain byte arrays, which can be concatenated, copied and pickled.
+    assert isinstance(tx.signatures[0], bytearray)
+    assert isinstance(tx.message.recent_blockhash, bytearray)
+    assert isinstance(tx.message.instructions[0].data + bytearray(1), bytearray)
+    assert pickle.loads(pickle.dumps(tx)).serialize() == data
+    assert copy.deepcopy(tx).serialize() == data
+    assert pxsol.core.Transaction.serialize_decode_reader(io.BytesIO(data)).json() == tx.json()
+    with pytest.raises(AssertionError):
+        pxsol.core.Transaction.serialize_decode(data[:-8])
+
+
+def test_transaction_view():
+    user = pxsol.core.PriKey.int_decode(1)
+    dest = pxsol.core.PriKey.int_decode(2).pubkey()
+    r0 = pxsol.core.Requisition(pxsol.core.ProgramSystem.pubkey, [], bytearray())
+    r0.account.append(pxsol.core.AccountMeta(user.pubkey(), 3))
+    r0.account.append(pxsol.core.AccountMeta(dest, 1))
+    r0.data = pxsol.core.ProgramSystem.transfer(1)
+    r1 = pxsol.core.Requisition(pxsol.core.ProgramSystem.pubkey, [], bytearray())
+    r1.account.append(pxsol.core.AccountMeta(user.pubkey(), 3))
+    r1.account.append(pxsol.core.AccountMeta(dest, 1))
+    r1.data = pxsol.core.ProgramSystem.transfer(2)
+    tx = pxsol.core.Transaction.requisition_decode(user.pubkey(), [r0, r1])
+    tx.message.recent_blockhash = bytearray(random.randbytes(32))
+    tx.sign([user])
+    data = tx.serialize()
+    tv = pxsol.core.TransactionView(data)
+    assert tv.signature_count == 1
+    assert tv.signature(0) == tx.signatures[0]
+    assert tv.header.json() == tx.message.header.json()
+    assert tv.account_count == len(tx.message.account_keys)
+    for i, e in enumerate(tx.message.account_keys):
+        assert tv.account_key(i) == e
+        assert tv.account_index(e) == i
+    assert tv.account_index(pxsol.core.PriKey.int_decode(3).pubkey()) == -1
+    assert tv.recent_blockhash() == tx.message.recent_blockhash
+    assert tv.message() == tx.message.serialize()
+    assert tv.instruction_count == 2
+    assert tv.instruction(1).json() == tx.message.instructions[1].json()
+    assert tv.instruction(0).json() == tx.message.instructions[0].json()
+    assert tv.transaction().json() == tx.json()
+    # The materialized transaction doesn't refer to the view, it can be pickled and modified.
+    t = pickle.loads(pickle.dumps(tv.transaction()))
+    assert t.serialize() == data
+    t.message.recent_blockhash[0] ^= 1
+    assert tv.recent_blockhash() == tx.message.recent_blockhash
+    with pytest.raises(AssertionError):
+        tv.instruction(2)
+    with pytest.raises(AssertionError):
+        pxsol.core.TransactionView(data[:-tv.instruction_count * 20 - 80])
+
+
+def test_transaction_serialize_cache():
+    user = pxsol.core.PriKey.int_decode(1)
+    rq = pxsol.core.Requisition(pxsol.core.ProgramSystem.pubkey, [], bytearray())
+    rq.account.append(pxsol.core.AccountMeta(user.pubkey(), 3))
+    rq.account.append(pxsol.core.AccountMeta(pxsol.core.PriKey.int_decode(2).pubkey(), 1))
+    rq.data = bytearray(random.randbytes(300))
+    tx = pxsol.core.Transaction.requisition_decode(user.pubkey(), [rq])
+    tx.message.recent_blockhash = bytearray(32)
+    size = tx.serialized_size()
+
+    # Serializing an unsigned transaction doesn't keep anything, in-place changes made afterwards are signed.
+    tx.serialize()
+    assert tx.signed is None
+    tx.message.instructions.append(pxsol.core.Instruction(2, [0, 1], pxsol.core.ProgramSystem.transfer(1)))
+    tx.sign([user])
+    assert tx.signed[0] is tx.message
+    assert tx.signed[1] == tx.message.serialize()
+    assert pxsol.eddsa.verify(user.pubkey().p, tx.message.serialize(), tx.signatures[0])
+    data = tx.serialize()
+    size += len(tx.message.instructions[1].serialize())
+    assert len(data) == size + 64 == tx.serialized_size()
+    assert pxsol.core.Transaction.serialize_decode(data).serialize() == data
+    # The message always reflects its fields, the transaction keeps the message as it was signed.
+    tx.message.recent_blockhash[0] = 1
+    tx.message.instructions[0].data[0] ^= 1
+    assert tx.message.serialize() != tx.signed[1]
+    assert tx.serialize() == data
+    # Signing again serializes the message afresh.
+    tx.message.header.readonly += 1
+    tx.signatures = []
+    tx.sign([user])
+    assert tx.signed[1] == tx.message.serialize()
+    assert tx.serialize()[-size + 1:] == tx.message.serialize()
+    # A message assigned after signing is serialized as is.
+    tx.message = pxsol.core.Message.serialize_decode(tx.message.serialize())
+    tx.message.recent_blockhash = bytearray(32)
+    assert tx.serialize()[-size + 1:] == tx.message.serialize()
+    assert tx.serialized_size() == len(tx.serialize())
+
+
+def test_transaction_requisition_decode():
+    payer = pxsol.core.PriKey.int_decode(1).pubkey()
+    pool = [pxsol.core.PriKey.int_decode(i).pubkey() for i in range(1, 9)]
+    rqs = []
+    for _ in range(8):
+        rq = pxsol.core.Requisition(random.choice(pool), [], bytearray(random.randbytes(4)))
+        for _ in range(random.randint(0, 8)):
+            rq.account.append(pxsol.core.AccountMeta(random.choice(pool), random.randint(0, 3)))
+        rqs.append(rq)
+    mode = [[a.mode for a in r.account] for r in rqs]
+    tx = pxsol.core.Transaction.requisition_decode(payer, rqs)
+    assert mode == [[a.mode for a in r.account] for r in rqs]
+    keys = tx.message.account_keys
+    assert keys[0] == payer
+    assert len(set(keys)) == len(keys)
+    want = {payer: 3}
+    for r in rqs:
+        want[r.program] = want.get(r.program, 0)
+        for a in r.account:
+            want[a.pubkey] = want.get(a.pubkey, 0) | a.mode
+    assert [want[k] for k in keys] == sorted(want.values(), reverse=True)
+    h = tx.message.header
+    assert h.required_signatures == len([k for k in keys if want[k] >= 2])
+    assert h.readonly_signatures == len([k for k in keys if want[k] == 2])
+    assert h.readonly == len([k for k in keys if want[k] == 0])
+    for r, i in zip(rqs, tx.message.instructions):
+        assert keys[i.program] == r.program
+        assert [keys[e] for e in i.account] == [a.pubkey for a in r.account]
+        assert i.data == r.data
+
+
+def test_transaction_template():
+    user = pxsol.core.PriKey.int_decode(1)
+    dest = pxsol.core.PriKey.int_decode(2).pubkey()
+    rq = pxsol.core.Requisition(pxsol.core.ProgramSystem.pubkey, [], bytearray())
+    rq.account.append(pxsol.core.AccountMeta(user.pubkey(), 3))
+    rq.account.append(pxsol.core.AccountMeta(dest, 1))
+    rq.data = pxsol.core.ProgramSystem.transfer(0)
+    tt = pxsol.core.TransactionTemplate.requisition_decode(user.pubkey(), [rq])
+    for i in range(3, 6):
+        dest = pxsol.core.PriKey.int_decode(i).pubkey()
+        hash = bytearray(random.randbytes(32))
+        tt.patch_account_key(tt.account_index(tt.account_keys[1]), dest)
+        tt.patch_instruction_data(0, pxsol.core.ProgramSystem.transfer(i))
+        tt.patch_recent_blockhash(hash)
+        rq.account[1] = pxsol.core.AccountMeta(dest, 1)
+        rq.data = pxsol.core.ProgramSystem.transfer(i)
+        tx = pxsol.core.Transaction.requisition_decode(user.pubkey(), [rq])
+        tx.message.recent_blockhash = hash
+        tx.sign([user])
+        assert tt.sign([user]) == tx.serialize()
+    with pytest.raises(AssertionError):
+        tt.patch_account_key(1, user.pubkey())
+    with pytest.raises(AssertionError):
+        tt.patch_instruction_data(0, bytearray(4))
+
+
+def test_address_lookup_table():
+    addresses = [pxsol.core.PriKey.int_decode(i).pubkey() for i in range(1, 5)]
+    table = pxsol.core.AddressLookupTable(addresses[0], addresses[1], 2**64 - 1, 42, 2, addresses)
+    data = table.serialize()
+    assert len(data) == pxsol.core.AddressLookupTable.size_metadata + 4 * 32
+    assert pxsol.core.AddressLookupTable.serialize_decode(addresses[0], data).json() == table.json()
+    table.authority = None
+    assert pxsol.core.AddressLookupTable.serialize_decode(addresses[0], table.serialize()).json() == table.json()
+    pxsol.core.address_lookup_table_cache.put(table)
+    assert pxsol.core.address_lookup_table_cache.get(addresses[0]) is table
+    pxsol.core.address_lookup_table_cache.pop(addresses[0])
+    assert pxsol.core.address_lookup_table_cache.get(addresses[0]) is None
+
+
+def test_transaction_v0():
+    user = pxsol.core.PriKey.int_decode(1)
+    pool = [pxsol.core.PriKey.int_decode(i).pubkey() for i in range(2, 66)]
+    program = pxsol.core.PriKey.int_decode(66).pubkey()
+    t0 = pxsol.core.AddressLookupTable(pool[0], None, 2**64 - 1, 0, 0, pool[:32] + [program])
+    t1 = pxsol.core.AddressLookupTable(pool[1], None, 2**64 - 1, 0, 0, pool[24:])
+    rq = pxsol.core.Requisition(program, [], bytearray(random.randbytes(16)))
+    rq.account.append(pxsol.core.AccountMeta(user.pubkey(), 3))
+    rq.account.append(pxsol.core.AccountMeta(pool[60], 2))
+    for i, e in enumerate(pool):
+        rq.account.append(pxsol.core.AccountMeta(e, i % 2))
+    rqs = [rq, pxsol.core.Requisition(pxsol.core.ProgramSystem.pubkey, [], bytearray())]
+    rqs[1].account.append(pxsol.core.AccountMeta(user.pubkey(), 3))
+    rqs[1].account.append(pxsol.core.AccountMeta(pool[63], 1))
+    rqs[1].data = pxsol.core.ProgramSystem.transfer(1)
+    legacy = pxsol.core.Transaction.requisition_decode(user.pubkey(), rqs)
+    tx = pxsol.core.Transaction.requisition_decode(user.pubkey(), rqs, [t0, t1])
+    assert isinstance(tx.message, pxsol.core.MessageV0)
+    # Signers and programs stay static, every other account is loaded from the first table holding it.
+    assert tx.message.account_keys == [user.pubkey(), pool[60], program, pxsol.core.ProgramSystem.pubkey]
+    assert tx.message.header.json() == [2, 1, 2]
+    lookups = tx.message.address_table_lookups
+    assert [e.account_key for e in lookups] == [pool[0], pool[1]]
+    assert lookups[0].writable_indexes == list(range(1, 32, 2))
+    assert lookups[0].readonly_indexes == list(range(0, 32, 2))
+    assert lookups[1].writable_indexes == [i - 24 for i in range(33, 64, 2)]
+    assert lookups[1].readonly_indexes == [i - 24 for i in range(32, 64, 2) if i != 60]
+    loaded = tx.message.account_keys[:]
+    for e, t in [(lookups[0], t0), (lookups[1], t1)]:
+        loaded.extend([t.addresses[i] for i in e.writable_indexes])
+    for e, t in [(lookups[0], t0), (lookups[1], t1)]:
+        loaded.extend([t.addresses[i] for i in e.readonly_indexes])
+    for a, b in zip(legacy.message.instructions, tx.message.instructions):
+        assert [legacy.message.account_keys[i] for i in a.account] == [loaded[i] for i in b.account]
+        assert a.data == b.data
+    tx.message.recent_blockhash = bytearray(random.randbytes(32))
+    tx.sign([user, pxsol.core.PriKey.int_decode(62)])
+    data = tx.serialize()
+    assert data[1 + 2 * 64] == 0x80
+    assert len(data) == tx.serialized_size()
+    assert len(data) < 1232 < len(legacy.serialize()) + 64 * 2
+    assert pxsol.core.Transaction.serialize_decode(data).json() == tx.json()
+    assert pxsol.core.Transaction.serialize_decode_reader(io.BytesIO(data)).json() == tx.json()
+    assert pxsol.core.Transaction.serialize_decode(data).serialize() == data
+    tv = pxsol.core.TransactionView(data)
+    assert tv.version == 0
+    assert tv.account_key(2) == program
+    assert tv.instruction(1).json() == tx.message.instructions[1].json()
+    assert tv.transaction().json() == tx.json()
+    # The materialized transaction doesn't refer to the view, it can be pickled and modified.
+    t = pickle.loads(pickle.dumps(tv.transaction()))
+    assert t.serialize() == data
+    t.message.recent_blockhash[0] ^= 1
+    assert tv.recent_blockhash() == tx.message.recent_blockhash
+    tt = pxsol.core.TransactionTemplate.requisition_decode(user.pubkey(), rqs, [t0, t1])
+    tt.patch_recent_blockhash(tx.message.recent_blockhash)
+    assert tt.sign([user, pxsol.core.PriKey.int_decode(62)]) == data
+
+
+def test_requisition_pack():
+    user = pxsol.core.PriKey.int_decode(1).pubkey()
+    pool = [pxsol.core.PriKey.int_decode(i).pubkey() for i in range(2, 66)]
+    rqs = []
+    for _ in range(256):
+        rq = pxsol.core.Requisition(random.choice(pool[:4]), [], bytearray(random.randbytes(random.randint(0, 64))))
+        rq.account.append(pxsol.core.AccountMeta(user, 3))
+        for _ in range(random.randint(0, 4)):
+            rq.account.append(pxsol.core.AccountMeta(random.choice(pool), random.choice([0, 1, 1, 1, 2, 3])))
+        rqs.append(rq)
+    txs = list(pxsol.core.requisition_pack(user, rqs))
+    done = []
+    for tx in txs:
+        data = [e.data for e in tx.message.instructions]
+        head = rqs[len(done):len(done) + len(data)]
+        assert [e.data for e in head] == data
+        done.extend(head)
+        size = tx.serialized_size() + tx.message.header.required_signatures * 64
+        assert size <= 1232
+        if len(done) < len(rqs):
+            full = pxsol.core.Transaction.requisition_decode(user, head + [rqs[len(done)]])
+            assert full.serialized_size() + full.message.header.required_signatures * 64 > 1232
+    assert len(done) == len(rqs)
+    transfer = []
+    for i in range(64):
+        rq = pxsol.core.Requisition(pxsol.core.ProgramSystem.pubkey, [], pxsol.core.ProgramSystem.transfer(i))
+        rq.account.append(pxsol.core.AccountMeta(user, 3))
+        rq.account.append(pxsol.core.AccountMeta(pool[i % 8], 1))
+        transfer.append(rq)
+    # The cost of each requisition is asked once, even when it is retried in a new transaction.
+    cost = []
+    txs = list(pxsol.core.requisition_pack(user, transfer, cost=lambda r: cost.append(r) or 150000))
+    assert [len(e.message.instructions) for e in txs] == [9] * 7 + [1]
+    assert cost == transfer
+    with pytest.raises(AssertionError):
+        rqs[0].data = bytearray(1232)
+        list(pxsol.core.requisition_pack(user, rqs))
+
+
+def test_compute_unit_cache():
+    assert pxsol.core.ProgramComputeBudget.set_compute_unit_limit(300) == bytearray([0x02, 0x2c, 0x01, 0x00, 0x00])
+    assert pxsol.core.ProgramComputeBudget.set_compute_unit_price(1) == bytearray([0x03, 0x01] + [0x00] * 7)
+    assert pxsol.core.ProgramComputeBudget.request_heap_frame(1024) == bytearray([0x01, 0x00, 0x04, 0x00, 0x00])
+    user = pxsol.core.PriKey.int_decode(1).pubkey()
+    rqs = []
+    for i in range(2):
+        rq = pxsol.core.Requisition(pxsol.core.ProgramSystem.pubkey, [], pxsol.core.ProgramSystem.transfer(i))
+        rq.account.append(pxsol.core.AccountMeta(user, 3))
+        rq.account.append(pxsol.core.AccountMeta(pxsol.core.PriKey.int_decode(i + 2).pubkey(), 1))
+        rqs.append(rq)
+    a = pxsol.core.ComputeUnitCache.shape(rqs[:1])
+    b = pxsol.core.ComputeUnitCache.shape(rqs[1:])
+    assert a == b
+    assert a != pxsol.core.ComputeUnitCache.shape(rqs)
+    assert a != pxsol.core.ComputeUnitCache.shape(rqs[:1], True)
+    cache = pxsol.core.ComputeUnitCache()
+    assert cache.get(a) is None
+    cache.put(a, 150)
+    assert cache.get(b) == 150
@@ -1,4 +1,5 @@
 import pxsol
+import random
 
 
 def test_g():
@@ -11,3 +12,17 @@ def test_g():
     q = pxsol.ed25519.G * pxsol.ed25519.Fr(3)
     assert q.x.x == 0x67ae9c4a22928f491ff4ae743edac83a6343981981624886ac62485fd3f8e25c
     assert q.y.x == 0x1267b1d177ee69aba126a18e60269ef79f16ec176724030402c3684878f5b4d4
+
+
+def test_gmul():
+    for _ in range(8):
+        k = pxsol.ed25519.Fr(random.randint(0, pxsol.ed25519.N - 1))
+        assert pxsol.ed25519.gmul(k) == pxsol.ed25519.G * k
+
+
+def test_dmul():
+    for _ in range(8):
+        a = pxsol.ed25519.Fr(random.randint(0, pxsol.ed25519.N - 1))
+        b = pxsol.ed25519.Fr(random.randint(0, pxsol.ed25519.N - 1))
+        p = pxsol.ed25519.G * pxsol.ed25519.Fr(random.randint(1, pxsol.ed25519.N - 1))
+        assert pxsol.ed25519.dmul(a, b, p) == pxsol.ed25519.G * a + p * b
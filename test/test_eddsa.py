@@ -3,6 +3,43 @@ import pytest
 import random
 
 
+def pt_decode_reference(pt: bytearray) -> pxsol.ed25519.Pt:
+    # The field arithmetic decoder, the integer implementation is validated against it.
+    uint = int.from_bytes(pt, 'little')
+    sign = uint >> 255
+    yint = uint & ((1 << 255) - 1)
+    assert yint < pxsol.ed25519.P
+    y = pxsol.ed25519.Fq(yint)
+    x_x = (y * y - pxsol.ed25519.Fq(1)) / (pxsol.ed25519.D * y * y + pxsol.ed25519.Fq(1))
+    x = x_x ** ((pxsol.ed25519.P + 3) // 8)
+    if x*x != x_x:
+        x = x * pxsol.ed25519.Fq(2) ** ((pxsol.ed25519.P - 1) // 4)
+        assert x*x == x_x
+    if x == pxsol.ed25519.Fq(0):
+        assert not sign
+    if x.x & 1 != sign:
+        x = -x
+    return pxsol.ed25519.Pt(x, y)
+
+
+def pt_exists_reference(pt: bytearray) -> bool:
+    uint = int.from_bytes(pt, 'little')
+    sign = uint >> 255
+    yint = uint & ((1 << 255) - 1)
+    if yint >= pxsol.ed25519.P:
+        return False
+    y = pxsol.ed25519.Fq(yint)
+    x_x = (y * y - pxsol.ed25519.Fq(1)) / (pxsol.ed25519.D * y * y + pxsol.ed25519.Fq(1))
+    x = x_x ** ((pxsol.ed25519.P + 3) // 8)
+    if x*x != x_x:
+        x = x * pxsol.ed25519.Fq(2) ** ((pxsol.ed25519.P - 1) // 4)
+    if x*x != x_x:
+        return False
+    if x == pxsol.ed25519.Fq(0) and sign:
+        return False
+    return True
+
+
 def test_fail_verify():
     # The probability of success is negligible.
     for _ in range(8):
@@ -33,6 +70,25 @@ def test_pt_exists():
                 pxsol.eddsa.pt_decode(ptbyte)
 
 
+def test_pt_exists_reference():
+    data = [bytearray(random.randbytes(32)) for _ in range(1000)]
+    data.extend(pxsol.eddsa.pt_encode(pxsol.ed25519.G * pxsol.ed25519.Fr(random.randint(1, pxsol.ed25519.N - 1)))
+                for _ in range(32))
+    # Edge cases: y = 1, y = -1 and y = 0, where x is zero or a root of -1, and y >= p, with either sign bit.
+    for y in [1, pxsol.ed25519.P - 1, 0, pxsol.ed25519.P, pxsol.ed25519.P + 1, (1 << 255) - 1]:
+        for sign in [0, 1]:
+            data.append(bytearray((y | sign << 255).to_bytes(32, 'little')))
+    for pt in data:
+        assert pxsol.eddsa.pt_exists(pt) == pt_exists_reference(pt)
+        if pt_exists_reference(pt):
+            assert pxsol.eddsa.pt_decode(pt) == pt_decode_reference(pt)
+        else:
+            with pytest.raises(AssertionError):
+                pxsol.eddsa.pt_decode(pt)
+            with pytest.raises(AssertionError):
+                pt_decode_reference(pt)
+
+
 def test_sign_verify():
     # https://datatracker.ietf.org/doc/html/rfc8032#section-7.1
     # Test Vectors for Ed25519
@@ -101,3 +157,38 @@ def test_sign_verify():
         0x3d, 0xca, 0x17, 0x9c, 0x13, 0x8a, 0xc1, 0x7a, 0xd9, 0xbe, 0xf1, 0x17, 0x73, 0x31, 0xa7, 0x04,
     ])
     assert pxsol.eddsa.verify(pubkey, msg, sig)
+
+
+def test_verify_batch():
+    data = []
+    for _ in range(8):
+        prikey = bytearray(random.randbytes(32))
+        msg = bytearray(random.randbytes(random.randint(0, 64)))
+        data.append((pxsol.eddsa.pubkey(prikey), msg, pxsol.eddsa.sign(prikey, msg)))
+    assert pxsol.eddsa.verify_batch(data) == [True] * 8
+    assert pxsol.eddsa.verify_batch(data[:1]) == [True]
+    data[3] = (data[3][0], data[3][1] + bytearray([0x00]), data[3][2])
+    data[5] = (data[5][0], data[5][1], bytearray(random.randbytes(64)))
+    assert pxsol.eddsa.verify_batch(data) == [True, True, True, False, True, False, True, True]
+    # Large batches are checked with one multi-scalar multiplication.
+    prikey = bytearray(random.randbytes(32))
+    data = [(pxsol.eddsa.pubkey(prikey), bytearray([i, i >> 8]), bytearray()) for i in range(256)]
+    data = [(A, msg, pxsol.eddsa.sign(prikey, msg)) for A, msg, _ in data]
+    assert pxsol.eddsa.verify_batch(data) == [True] * 256
+    data[7] = (data[7][0], data[7][1], bytearray(random.randbytes(64)))
+    assert pxsol.eddsa.verify_batch(data) == [True] * 7 + [False] + [True] * 248
+    data[7] = (data[7][0], data[7][1], pxsol.eddsa.sign(prikey, data[7][1]))
+    # Signatures whose R carries a point of order 4 pass the cofactored batch equation, but verify rejects them. The
+    # batch must agree with verify.
+    T = pxsol.ed25519.Pt(pxsol.ed25519.Fq(pxsol.ed25519.SQRT_M1), pxsol.ed25519.Fq(0))
+    assert T * pxsol.ed25519.Fr(4) == pxsol.ed25519.I
+    for i in range(2):
+        msg = bytearray(random.randbytes(random.randint(0, 64)))
+        a, _, A = pxsol.eddsa.expand(prikey)
+        r = pxsol.ed25519.Fr(random.randint(1, pxsol.ed25519.N - 1))
+        Rs = pxsol.eddsa.pt_encode(pxsol.ed25519.gmul(r) + T)
+        h = pxsol.ed25519.Fr(int.from_bytes(pxsol.eddsa.hash(Rs, A, msg), 'little'))
+        data[100 + i] = (A, msg, Rs + bytearray((r + h * a).x.to_bytes(32, 'little')))
+        assert not pxsol.eddsa.verify(*data[100 + i])
+    assert pxsol.eddsa.verify_batch(data) == [True] * 100 + [False, False] + [True] * 154
+    assert pxsol.eddsa.verify_batch(data[100:102]) == [False, False]
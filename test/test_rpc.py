@@ -1,4 +1,9 @@
+import concurrent.futures
+import http.server
+import json
 import pxsol
+import pytest
+import time
 
 
 def test_get_account_info():
@@ -234,3 +239,110 @@ def test_send_transaction():
 
 def test_simulate_transaction():
     pass
+
+
+class TransportHandler(http.server.BaseHTTPRequestHandler):
+    # A stand-in rpc server echoing the params of each call, it records the connections it accepts and the size of
+    # each batch. Batch responses are sent in reverse order. List-taking methods echo their list as the value and
+    # record its size. Each getLatestBlockhash returns a new blockhash.
+    batches = []
+    blockhash = 0
+    connections = 0
+    lists = []
+    disable_nagle_algorithm = True
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self) -> None:
+        super().setup()
+        TransportHandler.connections += 1
+
+    def do_POST(self) -> None:
+        data = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if isinstance(data, list):
+            TransportHandler.batches.append(len(data))
+            body = json.dumps([self.echo(e) for e in reversed(data)]).encode()
+        else:
+            body = json.dumps(self.echo(data)).encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def echo(self, data: dict) -> dict:
+        if data['method'] == 'fail':
+            return {'jsonrpc': '2.0', 'id': data['id'], 'error': {'code': -32601, 'message': 'Method not found'}}
+        if data['method'] == 'getLatestBlockhash':
+            TransportHandler.blockhash += 1
+            return {'jsonrpc': '2.0', 'id': data['id'], 'result': {'context': {}, 'value': {
+                'blockhash': pxsol.base58.encode(TransportHandler.blockhash.to_bytes(32)),
+                'lastValidBlockHeight': TransportHandler.blockhash + 150,
+            }}}
+        if data['method'] in ['getMultipleAccounts', 'getSignatureStatuses']:
+            TransportHandler.lists.append(len(data['params'][0]))
+            result = {'context': {'slot': int(data['params'][0][0])}, 'value': data['params'][0]}
+            return {'jsonrpc': '2.0', 'id': data['id'], 'result': result}
+        return {'jsonrpc': '2.0', 'id': data['id'], 'result': data['params']}
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+def test_transport(stand_in):
+    TransportHandler.connections = 0
+    stand_in(TransportHandler, {'pool': 2})
+    assert pxsol.rpc.call('getSlot', [1]) == [1]
+    with concurrent.futures.ThreadPoolExecutor(4) as pool:
+        assert list(pool.map(lambda x: pxsol.rpc.call('getSlot', [x]), range(64))) == [[e] for e in range(64)]
+    assert TransportHandler.connections <= 2
+    assert pxsol.rpc.transport() is pxsol.config.current.transport
+
+
+def test_batch(stand_in):
+    TransportHandler.batches.clear()
+    stand_in(TransportHandler, {'batch': 16})
+    assert pxsol.rpc.batch([('getSlot', [i]) for i in range(40)]) == [[i] for i in range(40)]
+    assert TransportHandler.batches == [16, 16, 8]
+    assert pxsol.rpc.batch([]) == []
+    r = pxsol.rpc.batch([('getSlot', [0]), ('fail', [])], True)
+    assert r[0] == [0]
+    assert isinstance(r[1], Exception)
+    with pytest.raises(Exception):
+        pxsol.rpc.batch([('getSlot', [0]), ('fail', [])])
+
+
+def test_get_multiple_accounts_chunk(stand_in):
+    TransportHandler.lists.clear()
+    stand_in(TransportHandler, {})
+    addr = [str(i) for i in range(250)]
+    assert pxsol.rpc.get_multiple_accounts(addr, {}) == {'context': {'slot': 0}, 'value': addr}
+    assert sorted(TransportHandler.lists) == [50, 100, 100]
+    TransportHandler.lists.clear()
+    assert pxsol.rpc.get_signature_statuses(addr[:256], {}) == addr[:256]
+    assert TransportHandler.lists == [250]
+
+
+def test_blockhash_cache(stand_in):
+    stand_in(TransportHandler, {})
+    blockhash = pxsol.rpc.BlockhashCache(0.05, 60)
+    try:
+        a = blockhash.get()
+        assert a == blockhash.get()
+        # Each caller gets its own copy of the cached blockhash.
+        a[0] ^= 1
+        assert a != blockhash.get()
+        a[0] ^= 1
+        assert blockhash.last_valid_block_height() == int.from_bytes(a) + 150
+        # The daemon thread refreshes the cache in the background.
+        time.sleep(0.2)
+        assert blockhash.get() != a
+        # An expired blockhash is fetched again before use.
+        blockhash.close()
+        b = blockhash.get()
+        blockhash.age = 0
+        assert blockhash.get() != b
+        assert pxsol.rpc.Blockhash().get() != blockhash.get()
+        c = blockhash.get()
+        assert blockhash.renew(c) != c
+        assert pxsol.rpc.Blockhash().renew(c) != c
+    finally:
+        blockhash.close()
@@ -0,0 +1,101 @@
+import asyncio
+import base64
+import http.server
+import json
+import pxsol
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    # A stand-in rpc server echoing the params of each call, it counts the connections it accepts. Odd ids are
+    # answered with a chunked body. The list of getMultipleAccounts is echoed as its value, with its first key as the
+    # slot of the context.
+    connections = 0
+    disable_nagle_algorithm = True
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self) -> None:
+        super().setup()
+        Handler.connections += 1
+
+    def do_POST(self) -> None:
+        data = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if isinstance(data, list):
+            body = json.dumps([{'jsonrpc': '2.0', 'id': e['id'], 'result': e['params']} for e in data]).encode()
+            chunked = False
+        elif data['method'] == 'getMultipleAccounts':
+            result = {'context': {'slot': int(data['params'][0][0])}, 'value': data['params'][0]}
+            body = json.dumps({'jsonrpc': '2.0', 'id': data['id'], 'result': result}).encode()
+            chunked = False
+        else:
+            body = json.dumps({'jsonrpc': '2.0', 'id': data['id'], 'result': data['params']}).encode()
+            chunked = data['params'][0] % 2 == 1
+        self.send_response(200)
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for i in range(0, len(body), 7):
+                self.wfile.write(f'{len(body[i:i + 7]):x}\r\n'.encode() + body[i:i + 7] + b'\r\n')
+            self.wfile.write(b'0\r\n\r\n')
+        else:
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+def test_transport(stand_in):
+    Handler.connections = 0
+    stand_in(Handler, {'pool': 4})
+
+    async def main():
+        r = await asyncio.gather(*[pxsol.rpc_async.call('getSlot', [i]) for i in range(256)])
+        assert r == [[i] for i in range(256)]
+        await pxsol.rpc_async.transport().close()
+
+    asyncio.run(main())
+    assert Handler.connections <= 4
+    # The transport is usable from a new event loop.
+    asyncio.run(main())
+
+
+def test_batch(stand_in):
+    stand_in(Handler, {'batch': 16})
+
+    async def main():
+        r = await pxsol.rpc_async.batch([('getSlot', [i]) for i in range(40)])
+        assert r == [[i] for i in range(40)]
+        await pxsol.rpc_async.transport().close()
+
+    asyncio.run(main())
+
+
+def test_get_multiple_accounts_chunk(stand_in):
+    stand_in(Handler, {})
+
+    async def main():
+        addr = [str(i) for i in range(250)]
+        assert await pxsol.rpc_async.get_multiple_accounts(addr, {}) == {'context': {'slot': 0}, 'value': addr}
+        await pxsol.rpc_async.transport().close()
+
+    asyncio.run(main())
+
+
+def test_get_balance():
+    addr = pxsol.core.PriKey.int_decode(1).pubkey().base58()
+    asyncio.run(pxsol.rpc_async.get_balance(addr, {}))
+
+
+def test_wait():
+    async def main():
+        user = pxsol.core.PriKey.int_decode(1)
+        rq = pxsol.core.Requisition(pxsol.core.ProgramSystem.pubkey, [], pxsol.core.ProgramSystem.transfer(1))
+        rq.account.append(pxsol.core.AccountMeta(user.pubkey(), 3))
+        rq.account.append(pxsol.core.AccountMeta(pxsol.core.PriKey.int_decode(2).pubkey(), 1))
+        tx = pxsol.core.Transaction.requisition_decode(user.pubkey(), [rq])
+        tx.message.recent_blockhash = pxsol.base58.decode((await pxsol.rpc_async.get_latest_blockhash({}))['blockhash'])
+        tx.sign([user])
+        txid = await pxsol.rpc_async.send_transaction(base64.b64encode(tx.serialize()).decode(), {})
+        await pxsol.rpc_async.wait([txid])
+    asyncio.run(main())
@@ -1,5 +1,34 @@
+import base64
 import pathlib
 import pxsol
+import pytest
+
+
+def test_address_lookup_table():
+    user = pxsol.wallet.Wallet(pxsol.core.PriKey.int_decode(1))
+    addresses = [pxsol.core.PriKey.int_decode(i).pubkey() for i in range(2, 42)]
+    pubkey = user.address_lookup_table_create(addresses)
+    table = pxsol.core.address_lookup_table_cache.get(pubkey)
+    assert table.addresses == addresses
+    assert table.authority == user.pubkey
+
+
+def test_compute_budget():
+    user = pxsol.wallet.Wallet(pxsol.core.PriKey.int_decode(1))
+    rq = pxsol.core.Requisition(pxsol.core.ProgramSystem.pubkey, [], pxsol.core.ProgramSystem.transfer(1))
+    rq.account.append(pxsol.core.AccountMeta(user.pubkey, 3))
+    rq.account.append(pxsol.core.AccountMeta(pxsol.core.PriKey.int_decode(2).pubkey(), 1))
+    rqs = user.compute_budget([rq], 1)
+    assert len(rqs) == 3
+    assert rqs[0].program == pxsol.core.ProgramComputeBudget.pubkey
+    assert pxsol.core.compute_unit_cache.get(pxsol.core.ComputeUnitCache.shape([rq], True)) > 0
+    # The limit covers the compute budget instructions as well, the transaction is processed.
+    tx = pxsol.core.Transaction.requisition_decode(user.pubkey, rqs)
+    tx.message.recent_blockhash = pxsol.base58.decode(pxsol.rpc.get_latest_blockhash({})['blockhash'])
+    tx.sign([user.prikey])
+    pxsol.rpc.wait([pxsol.rpc.send_transaction(base64.b64encode(tx.serialize()).decode(), {})])
+    with pytest.raises(AssertionError):
+        user.compute_budget(rqs, 1)
 
 
 def test_program():
@@ -32,3 +61,17 @@ def test_transfer_all():
     user.transfer(hole.pubkey, 1 * pxsol.denomination.sol)
     hole.transfer_all(user.pubkey)
     assert hole.balance() == 0
+
+
+def test_transfer_blockhash_cache():
+    blockhash = pxsol.rpc.BlockhashCache()
+    user = pxsol.wallet.Wallet(pxsol.core.PriKey.int_decode(1), blockhash)
+    hole = pxsol.wallet.Wallet(pxsol.core.PriKey.int_decode(2), blockhash)
+    a = hole.balance()
+    # Identical transfers inside one refresh window are both processed.
+    x = user.transfer(hole.pubkey, 1 * pxsol.denomination.sol)
+    y = user.transfer(hole.pubkey, 1 * pxsol.denomination.sol)
+    assert x != y
+    b = hole.balance()
+    assert b == a + 2 * pxsol.denomination.sol
+    blockhash.close()